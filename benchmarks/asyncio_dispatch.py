@@ -0,0 +1,75 @@
+'''Measures how many callbacks per second an AsyncioDispatcher can accept from
+other threads and run, for the default asyncio event loop and for uvloop.
+
+Callbacks are dispatched from a number of threads, as record processing
+callbacks are dispatched from the EPICS scan and CA server threads, and the
+time is measured until the last has completed.  uvloop is only measured if
+it is installed.
+
+Run with:
+
+    python benchmarks/asyncio_dispatch.py [--threads N] [--calls N]
+'''
+
+import asyncio
+import threading
+import time
+from argparse import ArgumentParser
+
+from softioc.asyncio_dispatcher import AsyncioDispatcher
+
+
+def measure(loop_factory, batched, threads, calls):
+    total = threads * calls
+    completed = [0]
+    done = threading.Event()
+
+    def callback():
+        pass
+
+    # Only ever called on the loop thread, so needs no locking
+    def completion():
+        completed[0] += 1
+        if completed[0] == total:
+            done.set()
+
+    with AsyncioDispatcher(
+            batched = batched, loop_factory = loop_factory) as dispatcher:
+        def dispatch():
+            for _ in range(calls):
+                dispatcher(callback, completion = completion)
+
+        workers = [threading.Thread(target = dispatch) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        done.wait()
+        elapsed = time.perf_counter() - start
+
+    return total / elapsed
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument('--threads', type = int, default = 4)
+    parser.add_argument('--calls', type = int, default = 25000)
+    args = parser.parse_args()
+
+    loops = [('asyncio', asyncio.new_event_loop)]
+    try:
+        import uvloop
+    except ImportError:
+        print('uvloop is not installed, only measuring the default loop')
+    else:
+        loops.append(('uvloop', uvloop.new_event_loop))
+
+    for name, loop_factory in loops:
+        for batched in [False, True]:
+            rate = measure(loop_factory, batched, args.threads, args.calls)
+            print('%-8s batched=%-5s %.0f callbacks/s' % (name, batched, rate))
+
+
+if __name__ == '__main__':
+    main()
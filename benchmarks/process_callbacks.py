@@ -0,0 +1,45 @@
+'''Measures how many record process callbacks Python device support can
+handle per second.
+
+A database of longout records is created and each record is then written
+repeatedly with set().  This processes the record synchronously in the calling
+thread, so the measured rate is that of the dset process callback path:
+EPICS record support, the callback into Python and the Python _process method.
+
+Run with:
+
+    python benchmarks/process_callbacks.py [--records N] [--passes N]
+'''
+
+import time
+from argparse import ArgumentParser
+
+from softioc import asyncio_dispatcher, builder, softioc
+
+
+def run(records, passes):
+    builder.SetDeviceName('BENCHMARK')
+    pvs = [
+        builder.longOut('OUT%d' % n, initial_value = 0)
+        for n in range(records)]
+    builder.LoadDatabase()
+    softioc.iocInit(asyncio_dispatcher.AsyncioDispatcher())
+
+    start = time.perf_counter()
+    for value in range(1, passes + 1):
+        for pv in pvs:
+            pv.set(value)
+    elapsed = time.perf_counter() - start
+
+    calls = records * passes
+    print('%d process callbacks on %d records in %.3f s: %.0f calls/s' % (
+        calls, records, elapsed, calls / elapsed))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--records', type = int, default = 10000)
+    parser.add_argument('--passes', type = int, default = 10)
+    args = parser.parse_args()
+    run(args.records, args.passes)
+    softioc.safeEpicsExit(0)
@@ -0,0 +1,39 @@
+"""Writes autosave files as YAML.
+
+This is imported by softioc.autosave, and is also run as a script by it to
+write the complete autosave file in a separate Python process.  Serialising a
+large state to YAML holds the GIL for long enough to hold up record processing,
+whereas handing the state over with pickle takes a few milliseconds.  It is run
+by path rather than as part of the softioc package, as importing the package
+initialises EPICS.
+"""
+
+import pickle
+import sys
+
+import numpy
+import yaml
+
+# Use the much faster libyaml dumper if PyYAML has been built with it
+Dumper = getattr(yaml, "CDumper", yaml.Dumper)
+
+
+def _ndarray_representer(dumper, array):
+    return dumper.represent_sequence(
+        "tag:yaml.org,2002:seq", array.tolist(), flow_style=True
+    )
+
+
+yaml.add_representer(numpy.ndarray, _ndarray_representer, Dumper=Dumper)
+
+
+def dump(data, stream, **kwargs):
+    """Writes data to stream as YAML, in the layout used for autosave files."""
+    yaml.dump(data, stream, Dumper=Dumper, indent=4, **kwargs)
+
+
+if __name__ == "__main__":
+    # The pickled state is read from stdin and written to the path given
+    state = pickle.load(sys.stdin.buffer)
+    with open(sys.argv[1], "w") as f:
+        dump(state, f)
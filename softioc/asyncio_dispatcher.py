@@ -5,8 +5,23 @@ import threading
 import atexit
 import signal
 
+from .callback_queue import CallbackQueue
+from .dispatcher_stats import DispatcherStats
+
+def uvloop_loop_factory():
+    """A ``loop_factory`` for `AsyncioDispatcher` which creates a uvloop event
+    loop if uvloop is installed, and a default asyncio event loop otherwise."""
+    try:
+        import uvloop
+    except ImportError:
+        return asyncio.new_event_loop()
+    else:
+        return uvloop.new_event_loop()
+
+
 class AsyncioDispatcher:
-    def __init__(self, loop=None, debug=False):
+    def __init__(
+            self, loop=None, debug=False, batched=False, loop_factory=None):
         """A dispatcher for `asyncio` based IOCs, suitable to be passed to
         `softioc.iocInit`. Means that `on_update` callback functions can be
         async.
@@ -15,16 +30,50 @@ class AsyncioDispatcher:
         Event Loop will be created and run in a dedicated thread.
         ``debug`` is passed through to ``asyncio.run()``.
 
+        If ``loop_factory`` is given then it is called with no arguments to
+        create the new Event Loop, for example `uvloop_loop_factory` to use
+        the faster uvloop implementation when it is installed.
+
+        If ``batched`` is True then callbacks are queued and the loop is woken
+        at most once per iteration to run every queued callback, rather than
+        scheduling a separate task for each callback.  Synchronous callbacks
+        are then run directly on the loop, and only coroutines become tasks.
+
+        Callbacks are started in order of record priority (the ``PRIO`` field),
+        and in the order they were dispatched for records of the same priority.
+
+        Statistics for the callbacks run are collected in ``stats``, a
+        `softioc.dispatcher_stats.DispatcherStats`.
+
         For a clean exit, call ``softioc.interactive_ioc(..., call_exit=False)``
         """
+        self.stats = DispatcherStats()
+        # Callbacks waiting to be started, in priority order.
+        self.__queue = CallbackQueue()
+
+        self.__batched = batched
+        if batched:
+            # Whether a call to __run_batch has already been scheduled.
+            self.__batch_scheduled = False
+            # Hang onto the tasks created for coroutines until they complete
+            self.__tasks = set()
+
+        assert loop is None or loop_factory is None, \
+            'Cannot specify loop and loop_factory together'
+
         if loop is None:
             # will wait until worker is executing the new loop
             started = threading.Event()
             # Make one and run it in a background thread
-            self.__worker = threading.Thread(
-                target=asyncio.run,
-                args=(self.__inloop(started),),
-                kwargs={'debug': debug})
+            if loop_factory is None:
+                self.__worker = threading.Thread(
+                    target=asyncio.run,
+                    args=(self.__inloop(started),),
+                    kwargs={'debug': debug})
+            else:
+                self.__worker = threading.Thread(
+                    target=self.__run_loop,
+                    args=(loop_factory, self.__inloop(started), debug))
             # Explicitly manage worker thread as part of interpreter shutdown.
             # Otherwise threading module will deadlock trying to join()
             # before our atexit hook runs, while the loop is still running.
@@ -60,6 +109,26 @@ class AsyncioDispatcher:
 
         stop_event.wait()
 
+    @staticmethod
+    def __run_loop(loop_factory, coro, debug):
+        # As asyncio.run(), but running on a loop created by loop_factory.
+        loop = loop_factory()
+        try:
+            asyncio.set_event_loop(loop)
+            loop.set_debug(debug)
+            loop.run_until_complete(coro)
+
+            # Cancel anything left running, as asyncio.run() does
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(
+                asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(loop.shutdown_asyncgens())
+        finally:
+            asyncio.set_event_loop(None)
+            loop.close()
+
     async def __inloop(self, started):
         self.loop = asyncio.get_running_loop()
         self.__interrupt = asyncio.Event()
@@ -73,23 +142,87 @@ class AsyncioDispatcher:
             self.__worker.join()
             self.__worker = None
 
+    def __run_batch(self):
+        # Clear the flag first, so that any callback queued from here on
+        # schedules a further call.  Only the callbacks already queued are run
+        # now, later ones wait for the next loop iteration.
+        self.__batch_scheduled = False
+        size = len(self.__queue)
+        if size:
+            # A batch scheduled twice by racing callers may find nothing to run
+            self.stats.batch(size)
+        for _ in range(size):
+            func, func_args, completion, completion_args, dispatched = \
+                self.__queue.get()
+            token = self.stats.started(dispatched)
+            failed = False
+            try:
+                ret = func(*func_args)
+            except Exception:
+                failed = True
+                logging.exception("Exception when running dispatched callback")
+            else:
+                if inspect.isawaitable(ret):
+                    task = self.loop.create_task(
+                        self.__await(ret, completion, completion_args, token))
+                    self.__tasks.add(task)
+                    task.add_done_callback(self.__tasks.discard)
+                    continue
+            if completion:
+                completion(*completion_args)
+            self.stats.finished(token, failed)
+
+    async def __await(self, ret, completion, completion_args, token):
+        failed = False
+        try:
+            await ret
+        except Exception:
+            failed = True
+            logging.exception("Exception when running dispatched callback")
+        finally:
+            if completion:
+                completion(*completion_args)
+            self.stats.finished(token, failed)
+
     def __call__(
             self,
             func,
             func_args=(),
             completion = None,
-            completion_args=()):
+            completion_args=(),
+            record_name = None,
+            priority = None):
+        dispatched = self.stats.dispatched(record_name)
+        if self.__batched:
+            self.__queue.put(
+                (func, func_args, completion, completion_args, dispatched),
+                priority)
+            if not self.__batch_scheduled:
+                self.__batch_scheduled = True
+                self.loop.call_soon_threadsafe(self.__run_batch)
+            return
+
         async def async_wrapper():
+            token = self.stats.started(dispatched)
+            failed = False
             try:
                 ret = func(*func_args)
                 if inspect.isawaitable(ret):
                     await ret
             except Exception:
+                failed = True
                 logging.exception("Exception when running dispatched callback")
             finally:
                 if completion:
                     completion(*completion_args)
-        asyncio.run_coroutine_threadsafe(async_wrapper(), self.loop)
+                self.stats.finished(token, failed)
+        self.__queue.put(async_wrapper, priority)
+        asyncio.run_coroutine_threadsafe(self.__run_next(), self.loop)
+
+    async def __run_next(self):
+        # Each dispatched callback schedules one call to this, which runs the
+        # highest priority callback waiting.
+        await self.__queue.get()()
 
     def __enter__(self):
         return self
@@ -1,27 +1,36 @@
 import atexit
+import logging
+import pickle
+import subprocess
 import sys
 import threading
+import time
 import traceback
+import uuid
 from datetime import datetime
-from os import rename
+from os import fsync, rename
 from pathlib import Path
 from shutil import copy2
 
 import numpy
 import yaml
 
+from . import _autosave_writer
+
 SAV_SUFFIX = "softsav"
 SAVB_SUFFIX = "softsavB"
+NPZ_SUFFIX = "npz"
+JOURNAL_SUFFIX = "journal"
 DEFAULT_SAVE_PERIOD = 30.0
+DEFAULT_COMPACT_PERIOD = 600.0
+# Key in the autosave file identifying the journal which applies to it
+_GENERATION_KEY = "__journal_generation__"
+# Formats for the autosave file, see configure
+FORMATS = ["yaml", "npz"]
 
 
-def _ndarray_representer(dumper, array):
-    return dumper.represent_sequence(
-        "tag:yaml.org,2002:seq", array.tolist(), flow_style=True
-    )
-
-
-yaml.add_representer(numpy.ndarray, _ndarray_representer, Dumper=yaml.Dumper)
+# Use the much faster libyaml loader if PyYAML has been built with it
+_Loader = getattr(yaml, "CFullLoader", yaml.FullLoader)
 
 
 def configure(
@@ -30,6 +39,9 @@ def configure(
     save_period=DEFAULT_SAVE_PERIOD,
     timestamped_backups=True,
     enabled=True,
+    format="yaml",
+    journal=False,
+    compact_period=DEFAULT_COMPACT_PERIOD,
 ):
     """This should be called before initialising the IOC. Configures the
     autosave thread for periodic backing up of PV values.
@@ -46,17 +58,31 @@ def configure(
             False then backups get overwritten on each IOC restart.
         enabled: boolean which enables or disables autosave, set to True by
             default, or False if configure not called.
+        format: "yaml" by default, which saves all values to a single YAML
+            file. With "npz" numeric arrays are instead saved to a binary
+            ``.npz`` file alongside the YAML file, which is much faster to
+            save and load for large waveforms.
+        journal: boolean which enables journal mode, False by default. Instead
+            of rewriting the whole autosave file, changed values are appended
+            to a journal file which is synced to disk once per save.
+        compact_period: time in seconds between rewriting the whole autosave
+            file and clearing the journal, when journal mode is enabled.
     """
     directory_path = Path(directory)
     if not directory_path.is_dir():
         raise FileNotFoundError(
             f"{directory} is not a valid autosave directory"
         )
+    if format not in FORMATS:
+        raise ValueError(f"Unknown autosave format: {format}")
     AutosaveConfig.directory = directory_path
     AutosaveConfig.timestamped_backups = timestamped_backups
     AutosaveConfig.save_period = save_period
     AutosaveConfig.enabled = enabled
     AutosaveConfig.device_name = name
+    AutosaveConfig.format = format
+    AutosaveConfig.journal = journal
+    AutosaveConfig.compact_period = compact_period
 
 
 class AutosaveConfig:
@@ -65,6 +91,9 @@ class AutosaveConfig:
     timestamped_backups = True
     save_period = DEFAULT_SAVE_PERIOD
     enabled = False
+    format = "yaml"
+    journal = False
+    compact_period = DEFAULT_COMPACT_PERIOD
 
 
 def start_autosave_thread():
@@ -116,14 +145,47 @@ def add_pv_to_autosave(pv, name, fields):
     if context._in_cm:  # _fields should always be a list if in context manager
         fields.update(context._fields)
     for field in fields:
-        field_name = name if field == "VAL" else f"{name}.{field}"
+        if field == "VAL":
+            field_name = name
+        else:
+            # Other fields can be changed without our knowledge, so are read
+            # on every save.
+            field_name = f"{name}.{field}"
+            Autosave._polled.add(field_name)
         Autosave._pvs[field_name] = _AutosavePV(pv, field)
+        # Ensure the value is read on the next save
+        Autosave._mark_dirty(field_name)
+
+
+def is_tracked(name):
+    """Returns whether the VAL field of the named PV is tracked by autosave."""
+    return name in Autosave._pvs
+
+
+def mark_dirty(*names):
+    """Marks the VAL field of each named PV as changed, so that it is read on
+    the next save. This is called by the record whenever its value is set or
+    written, and does nothing for PVs not tracked by autosave.
+    """
+    names = [name for name in names if name in Autosave._pvs]
+    if names:
+        Autosave._mark_dirty(*names)
 
 
 def load_autosave():
     Autosave._load()
 
 
+def restore_saved_value(pv, name):
+    """Called at the end of the construction of a PV to restore its saved VAL
+    as its initial value, if autosave has been configured. The values of PVs
+    created before configure was called, and of fields other than VAL, are
+    restored by load_autosave instead.
+    """
+    if AutosaveConfig.enabled and name in Autosave._pvs:
+        Autosave._restore(pv, name)
+
+
 class _AutosavePV:
     def __init__(self, pv, field):
         if field == "VAL":
@@ -158,6 +220,147 @@ def _get_backup_sav_path():
     return sav_path.parent / (sav_path.name + ".bu")
 
 
+def _get_arrays_path(sav_path):
+    # Numeric arrays saved in the "npz" format are kept alongside the YAML file
+    return sav_path.parent / f"{sav_path.name}.{NPZ_SUFFIX}"
+
+
+def _get_journal_path(sav_path):
+    return sav_path.parent / f"{sav_path.name}.{JOURNAL_SUFFIX}"
+
+
+def _is_binary_array(value):
+    return isinstance(value, numpy.ndarray) and value.dtype.kind in "biuf"
+
+
+def _write_state(state, changes):
+    """Writes the state to the autosave file, first writing to a temporary file
+    and then using an atomic os.rename to safely update the stored state. In
+    the "npz" format the arrays file is only rewritten if an array has
+    changed. In journal mode returns the new generation written to the file,
+    which the journal must start with to be applied to it."""
+    sav_path = _get_current_sav_path()
+    tmp_path = _get_tmp_sav_path()
+    if AutosaveConfig.format == "npz":
+        arrays = {
+            key: value
+            for key, value in state.items()
+            if _is_binary_array(value)
+        }
+        state = {
+            key: value for key, value in state.items() if key not in arrays
+        }
+        arrays_path = _get_arrays_path(sav_path)
+        if not arrays_path.is_file() or any(
+            _is_binary_array(value) for value in changes.values()
+        ):
+            tmp_arrays_path = _get_arrays_path(tmp_path)
+            with open(tmp_arrays_path, "wb") as backup:
+                numpy.savez(backup, **arrays)
+            rename(tmp_arrays_path, arrays_path)
+    generation = uuid.uuid4().hex if AutosaveConfig.journal else None
+    if generation:
+        state = {**state, _GENERATION_KEY: generation}
+    _write_yaml(state, tmp_path)
+    rename(tmp_path, sav_path)
+    # The new file includes every change in the journal.  If this is never
+    # reached the journal is still ignored, as its generation does not match.
+    journal_path = _get_journal_path(sav_path)
+    if journal_path.is_file():
+        journal_path.unlink()
+    return generation
+
+
+def _write_yaml(state, path):
+    """Writes the state to path as YAML. Where possible this is done by a
+    separate Python process, so that this thread waits with the GIL released
+    instead of holding it for the whole of the serialisation."""
+    if sys.executable:
+        subprocess.run(
+            [sys.executable, _autosave_writer.__file__, str(path)],
+            input=pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL),
+            check=True,
+        )
+    else:
+        # Embedded interpreters may not have an executable to run
+        with open(path, "w") as backup:
+            _autosave_writer.dump(state, backup)
+
+
+def _dump_journal_entry(entry, journal):
+    # Entries end with an explicit "..." so that an entry cut short by an
+    # interrupted write can be recognised.
+    _autosave_writer.dump(
+        entry, journal, explicit_start=True, explicit_end=True
+    )
+
+
+def _append_journal(changes, generation):
+    """Appends the changes to the journal as a single YAML document, and waits
+    for them to be written to disk. A new journal starts with the generation
+    of the autosave file it applies to."""
+    with open(_get_journal_path(_get_current_sav_path()), "a") as journal:
+        if journal.tell() == 0:
+            _dump_journal_entry({_GENERATION_KEY: generation}, journal)
+        _dump_journal_entry(changes, journal)
+        journal.flush()
+        fsync(journal.fileno())
+
+
+def _read_journal(journal_path, generation):
+    """Returns the complete entries in the journal, in the order they were
+    saved, or nothing if the journal does not apply to the autosave file with
+    the given generation."""
+    entries = []
+    lines = []
+    with open(journal_path, "r") as f:
+        for line in f:
+            lines.append(line)
+            if line == "...\n":
+                try:
+                    entries.append(yaml.load("".join(lines), Loader=_Loader))
+                except yaml.YAMLError:
+                    break
+                lines = []
+    if lines:
+        # The last write to the journal may have been interrupted
+        print(
+            f"Ignoring incomplete entry in {journal_path}", file=sys.stderr
+        )
+    if (
+        generation is None
+        or not entries
+        or not isinstance(entries[0], dict)
+        or entries[0].get(_GENERATION_KEY) != generation
+    ):
+        print(
+            f"Ignoring {journal_path} from an earlier autosave file",
+            file=sys.stderr,
+        )
+        return []
+    return [changes for changes in entries[1:] if isinstance(changes, dict)]
+
+
+def _read_state(sav_path):
+    with open(sav_path, "r") as f:
+        state = yaml.load(f, Loader=_Loader) or {}
+    generation = state.pop(_GENERATION_KEY, None)
+    # Arrays saved in the "npz" format are only used for values missing from
+    # the YAML file, so an old arrays file is ignored if the format changes.
+    arrays_path = _get_arrays_path(sav_path)
+    if arrays_path.is_file():
+        with numpy.load(arrays_path, allow_pickle=False) as arrays:
+            for key in arrays.files:
+                state.setdefault(key, arrays[key])
+    # Changes in the journal are newer than the autosave file, and are applied
+    # in the order they were saved.
+    journal_path = _get_journal_path(sav_path)
+    if journal_path.is_file():
+        for changes in _read_journal(journal_path, generation):
+            state.update(changes)
+    return state
+
+
 class _AutosaveContext(threading.local):
     _instance = None
     _lock = threading.Lock()
@@ -180,8 +383,24 @@ class _AutosaveContext(threading.local):
 
 class Autosave:
     _pvs = {}
+    # Fields other than VAL, which are read on every save
+    _polled = set()
+    # Fields marked as changed since the last save
+    _dirty = set()
+    _dirty_lock = threading.Lock()
     _last_saved_state = {}
     _last_saved_time = datetime.now()
+    # time.monotonic() of the last time the whole file was written, when
+    # using a journal
+    _last_compacted = None
+    # Generation of the autosave file that journal entries apply to
+    _generation = None
+    # State read from the autosave file, or None until it is needed, and the
+    # fields already restored from it while constructing their PVs
+    _saved_state = None
+    _restored = set()
+    # Time in seconds spent in each phase of loading the autosave file
+    _load_times = {"read": 0.0, "restore": 0.0, "set": 0.0}
     _stop_event = threading.Event()
     _loop_started = False
 
@@ -234,6 +453,9 @@ class Autosave:
             backup_path = _get_backup_sav_path()
         if sav_path.is_file():
             copy2(sav_path, backup_path)
+            for get_path in [_get_arrays_path, _get_journal_path]:
+                if get_path(sav_path).is_file():
+                    copy2(get_path(sav_path), get_path(backup_path))
         else:
             print(
                 f"Could not back up autosave, {sav_path} is not a file",
@@ -241,19 +463,48 @@ class Autosave:
             )
 
     @classmethod
-    def __get_state(cls):
-        state = {}
-        for pv_field, pv in cls._pvs.items():
+    def _mark_dirty(cls, *pv_fields):
+        with cls._dirty_lock:
+            cls._dirty.update(pv_fields)
+
+    @classmethod
+    def __get_changes(cls):
+        # Only the fields marked as changed since the last save, together with
+        # the polled fields, are read and compared with the saved state.  This
+        # is a quick snapshot of the values to be saved, which are only
+        # written out afterwards by _write_state.
+        with cls._dirty_lock:
+            dirty, cls._dirty = cls._dirty, set()
+        changes = {}
+        for pv_field in dirty | cls._polled:
+            pv = cls._pvs.get(pv_field)
+            if pv is None:
+                continue
             try:
-                state[pv_field] = pv.get()
+                value = pv.get()
             except Exception:
                 print(f"Exception getting {pv_field}", file=sys.stderr)
                 traceback.print_exc()
-        return state
+                continue
+            # checks equality for builtins and numpy arrays
+            if pv_field not in cls._last_saved_state or not numpy.array_equal(
+                value, cls._last_saved_state[pv_field]
+            ):
+                if isinstance(value, numpy.ndarray) and (
+                    value.flags.writeable or value.base is not None
+                ):
+                    # Arrays which can still be changed are copied, but the
+                    # frozen arrays held by most waveforms are kept as they
+                    # are.
+                    value = value.copy()
+                changes[pv_field] = value
+        return changes
 
     @classmethod
-    def __set_pvs_from_saved_state(cls):
-        for pv_field, value in cls._last_saved_state.items():
+    def __set_pvs_from_saved_state(cls, state):
+        for pv_field, value in state.items():
+            if pv_field in cls._restored:
+                continue
             try:
                 pv = cls._pvs[pv_field]
                 pv.set(value)
@@ -265,31 +516,35 @@ class Autosave:
                 traceback.print_exc()
 
     @classmethod
-    def __state_changed(cls, state):
-        return cls._last_saved_state.keys() != state.keys() or any(
-            # checks equality for builtins and numpy arrays
-            not numpy.array_equal(state[key], cls._last_saved_state[key])
-            for key in state
+    def __compaction_due(cls, changes):
+        # Arrays saved in the "npz" format are not written to the journal
+        return (
+            cls._last_compacted is None
+            or time.monotonic() - cls._last_compacted
+            >= AutosaveConfig.compact_period
+            or AutosaveConfig.format == "npz"
+            and any(_is_binary_array(value) for value in changes.values())
         )
 
     @classmethod
     def _save(cls):
-        state = cls.__get_state()
-        if cls.__state_changed(state):
-            sav_path = _get_current_sav_path()
-            tmp_path = _get_tmp_sav_path()
-            # write to temporary file first then use atomic os.rename
-            # to safely update stored state
-            with open(tmp_path, "w") as backup:
-                yaml.dump(state, backup, indent=4)
-            rename(tmp_path, sav_path)
+        changes = cls.__get_changes()
+        if changes:
+            state = {**cls._last_saved_state, **changes}
+            if AutosaveConfig.journal and not cls.__compaction_due(changes):
+                _append_journal(changes, cls._generation)
+            else:
+                cls._generation = _write_state(state, changes)
+                cls._last_compacted = time.monotonic()
             cls._last_saved_state = state
             cls._last_saved_time = datetime.now()
 
     @classmethod
-    def _load(cls):
-        if not AutosaveConfig.enabled or not cls._pvs:
-            return
+    def __read_saved_state(cls):
+        # The autosave file is read when first needed, either when the first
+        # PV with a saved value is created or by _load.
+        if cls._saved_state is not None:
+            return cls._saved_state
         if not AutosaveConfig.device_name:
             raise RuntimeError(
                 "Device name is not known to autosave thread, "
@@ -304,6 +559,7 @@ class Autosave:
             raise FileNotFoundError(
                 f"{AutosaveConfig.directory} is not a valid autosave directory"
             )
+        start = time.monotonic()
         cls.__backup_sav_file()
         sav_path = _get_current_sav_path()
         if not sav_path or not sav_path.is_file():
@@ -311,10 +567,54 @@ class Autosave:
                 f"Could not load autosave values from file {sav_path}",
                 file=sys.stderr,
             )
+            cls._saved_state = {}
+        else:
+            cls._saved_state = _read_state(sav_path)
+        cls._load_times["read"] = time.monotonic() - start
+        return cls._saved_state
+
+    @classmethod
+    def _restore(cls, pv, pv_field):
+        state = cls.__read_saved_state()
+        if pv_field in state:
+            start = time.monotonic()
+            value = state[pv_field]
+            try:
+                pv._restore_value(value)
+            except Exception:
+                print(
+                    f"Exception restoring {pv_field} to {value}",
+                    file=sys.stderr,
+                )
+                traceback.print_exc()
+            else:
+                cls._restored.add(pv_field)
+            cls._load_times["restore"] += time.monotonic() - start
+
+    @classmethod
+    def _load(cls):
+        if not AutosaveConfig.enabled or not cls._pvs:
             return
-        with open(sav_path, "r") as f:
-            cls._last_saved_state = yaml.full_load(f)
-        cls.__set_pvs_from_saved_state()
+        state = cls.__read_saved_state()
+        start = time.monotonic()
+        cls.__set_pvs_from_saved_state(state)
+        # Saved values for PVs no longer tracked are dropped on the next save
+        cls._last_saved_state = {
+            pv_field: value
+            for pv_field, value in state.items()
+            if pv_field in cls._pvs
+        }
+        cls._load_times["set"] = time.monotonic() - start
+        logging.info(
+            "Autosave loaded %d values in %.3fs: read %.3fs, "
+            "restored %d during construction in %.3fs, set %.3fs",
+            len(state),
+            sum(cls._load_times.values()),
+            cls._load_times["read"],
+            len(cls._restored),
+            cls._load_times["restore"],
+            cls._load_times["set"],
+        )
 
     @classmethod
     def _stop(cls):
@@ -1,7 +1,7 @@
 import os
 import numpy
 
-from .device_core import RecordLookup
+from .device_core import RecordLookup, IoScanGroup  # noqa
 from .softioc import dbLoadDatabase
 from .autosave import load_autosave
 
@@ -12,7 +12,7 @@ LoadDbdFile(os.path.join(os.path.dirname(__file__), 'device.dbd'))
 
 from . import device, pythonSoftIoc  # noqa
 # Re-export this so users only have to import the builder
-from .device import SetBlocking, to_epics_str_array # noqa
+from .device import SetBlocking, set_many, to_epics_str_array # noqa
 
 PythonDevice = pythonSoftIoc.PythonDevice()
 
@@ -292,6 +292,35 @@ def longStringOut(name, **fields):
     return qform_string(PythonDevice.long_stringout(name, **fields))
 
 
+def aInBlock(prefix, names, dtype=numpy.float64, initial_value=0,
+             overflow_policy='drop', overflow_timeout=1.0, **fields):
+    '''Creates one scalar IN record named prefix + name for each of the given
+    names, with values held together in a single numpy array of the given
+    dtype.  Floating point values are published as ai records and integer
+    values as longin or int64in records.  The overflow policy applies to the
+    whole block.  Returns the RecordBlock.'''
+    dtype = numpy.dtype(dtype)
+    if dtype.kind == 'f':
+        record = PythonDevice.ai_block
+    elif numpy.can_cast(dtype, numpy.int32):
+        record = PythonDevice.longin_block
+        fields.setdefault('MDEL', -1)
+    elif numpy.can_cast(dtype, numpy.int64):
+        record = PythonDevice.int64in_block
+        fields.setdefault('MDEL', -1)
+    else:
+        assert False, 'Unsupported dtype %s for record block' % dtype
+
+    values = numpy.empty(len(names), dtype = dtype)
+    values[:] = initial_value
+    block = device.RecordBlock(values, overflow_policy, overflow_timeout)
+
+    _set_in_defaults(fields)
+    for index, name in enumerate(names):
+        record(prefix + name, _block = block, _block_index = index, **fields)
+    return block
+
+
 
 # ----------------------------------------------------------------------------
 #  Support routines for builder
@@ -344,9 +373,11 @@ __all__ = [
     'Waveform', 'WaveformIn', 'WaveformOut',
     'longStringIn', 'longStringOut',
     'Action',
+    'aInBlock',
     # Other builder support functions
     'LoadDatabase', 'ClearRecords',
     'SetDeviceName', 'UnsetDevice',
     # Device support functions
-    'SetBlocking'
+    'SetBlocking', 'set_many',
+    'IoScanGroup'
 ]
@@ -0,0 +1,37 @@
+import collections
+
+
+# Record priorities, as given by the PRIO field (the EPICS menuPriority menu).
+LOW = 0
+MEDIUM = 1
+HIGH = 2
+
+
+class CallbackQueue:
+    '''A queue of callbacks waiting to be run by a dispatcher, with a separate
+    FIFO queue for each record priority.  `get` returns the oldest callback of
+    the highest priority waiting.  `put` and `get` can safely be called from
+    different threads.'''
+
+    def __init__(self):
+        self.__queues = (
+            collections.deque(), collections.deque(), collections.deque())
+
+    def __len__(self):
+        return sum(map(len, self.__queues))
+
+    def put(self, callback, priority=None):
+        '''Adds a callback with the given priority, by default `LOW`.'''
+        if priority is None:
+            priority = LOW
+        self.__queues[priority].append(callback)
+
+    def get(self):
+        '''Removes and returns the next callback to run.  Raises `IndexError`
+        if there are none.'''
+        for queue in reversed(self.__queues):
+            try:
+                return queue.popleft()
+            except IndexError:
+                pass
+        raise IndexError('No callbacks queued')
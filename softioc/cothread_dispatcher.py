@@ -1,15 +1,43 @@
 import inspect
 import logging
+import time
+
+from .callback_queue import CallbackQueue
+from .dispatcher_stats import DispatcherStats
 
 class CothreadDispatcher:
-    def __init__(self, dispatcher = None):
+    def __init__(self, dispatcher = None, batch_size = None, batch_time = None):
         """A dispatcher for `cothread` based IOCs, suitable to be passed to
         `softioc.iocInit`.  By default scheduled tasks are run on a dedicated
         cothread callback thread, but an alternative dispatcher can optionally
         be specified here.  Realistically the only sensible alternative is to
         pass `cothread.Spawn`, which would create a separate cothread for each
         dispatched callback.
+
+        Callbacks are run in order of record priority (the ``PRIO`` field), and
+        in the order they were dispatched for records of the same priority.
+
+        If ``batch_size`` or ``batch_time`` is given then waiting callbacks are
+        run in batches, yielding to other cothreads after each batch.  A batch
+        stops after ``batch_size`` callbacks, or once ``batch_time`` seconds
+        have passed, whichever comes first.  This stops a burst of callbacks
+        from starving other cothreads.  The limits can be changed at any time
+        by assigning to the attributes of the same names.
+
+        Statistics for the callbacks run are collected in ``stats``, a
+        `softioc.dispatcher_stats.DispatcherStats`.
         """
+        self.stats = DispatcherStats()
+        self.__queue = CallbackQueue()
+
+        self.batch_size = batch_size
+        self.batch_time = batch_time
+        self.__batched = batch_size is not None or batch_time is not None
+        if self.__batched:
+            import cothread
+            self.__yield = cothread.Yield
+            # Whether a call to __run_batch has already been queued.
+            self.__batch_scheduled = False
 
         if dispatcher is None:
             # Import here to ensure we don't instantiate any of cothread's
@@ -28,17 +56,66 @@ class CothreadDispatcher:
             func,
             func_args=(),
             completion = None,
-            completion_args=()):
+            completion_args=(),
+            record_name = None,
+            priority = None):
         def wrapper():
+            token = self.stats.started(dispatched)
+            failed = False
             try:
                 func(*func_args)
             except Exception:
+                failed = True
                 logging.exception("Exception when running dispatched callback")
             finally:
                 if completion:
                     completion(*completion_args)
+                self.stats.finished(token, failed)
 
         assert not inspect.iscoroutinefunction(func)
         assert not inspect.iscoroutinefunction(completion)
 
-        self.__dispatcher(wrapper)
+        dispatched = self.stats.dispatched(record_name)
+        self.__queue.put(wrapper, priority)
+        if not self.__batched:
+            self.__dispatcher(self.__run_next)
+        elif not self.__batch_scheduled:
+            self.__batch_scheduled = True
+            self.__dispatcher(self.__run_batch)
+
+    def __run_next(self):
+        # Each dispatched callback queues one call to this, which runs the
+        # highest priority callback waiting.
+        self.__queue.get()()
+
+    def __run_one_batch(self):
+        # Runs callbacks until the queue is empty or a limit is reached, and
+        # returns whether callbacks are still waiting.
+        batch_size = self.batch_size
+        batch_time = self.batch_time
+        if batch_time is not None:
+            deadline = time.monotonic() + batch_time
+        size = 0
+        while self.__queue:
+            self.__queue.get()()
+            size += 1
+            if batch_size is not None and size >= batch_size or \
+                    batch_time is not None and time.monotonic() >= deadline:
+                break
+        limited = bool(self.__queue)
+        if size:
+            self.stats.batch(size, limited)
+        return limited
+
+    def __run_batch(self):
+        # Runs batches of callbacks, yielding between them, until no more
+        # callbacks are waiting.
+        while True:
+            if not self.__run_one_batch():
+                # Clear the flag before checking again, so that a callback
+                # queued from now on schedules another call.
+                self.__batch_scheduled = False
+                if not self.__queue:
+                    return
+                self.__batch_scheduled = True
+            self.__yield()
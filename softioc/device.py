@@ -1,6 +1,11 @@
+import asyncio
+import inspect
+import logging
 import os
 import time
 import ctypes
+import threading
+import concurrent.futures
 from ctypes import *
 import numpy
 from . import autosave
@@ -11,15 +16,56 @@ from .imports import (
     dbLoadDatabase,
     signal_processing_complete,
     recGblResetAlarms,
+    db_name_to_addr,
     db_put_field_process,
     db_get_field,
+    scan_io_request_many,
+    interruptAccept,
 )
-from .device_core import DeviceSupportCore, RecordLookup
+from .device_core import (
+    DeviceSupportCore,
+    RecordLookup,
+    IoScanGroup,
+    OverflowPolicy,
+    _callback_queue_full,
+)
+from .executor_dispatcher import ExecutorDispatcher
 
 
 # This is set from softioc.iocInit
 dispatcher = None
 
+# Dispatchers for the executors passed as on_update_executor, shared by all
+# records using the same executor.
+_executor_dispatchers = {}
+
+def _executor_dispatcher(executor):
+    try:
+        return _executor_dispatchers[executor]
+    except KeyError:
+        dispatcher = ExecutorDispatcher(executor)
+        _executor_dispatchers[executor] = dispatcher
+        return dispatcher
+
+# Whether each dispatcher accepts the record_name and priority arguments, which
+# dispatchers written before they were added do not.
+_dispatcher_record_info = {}
+
+def _accepts_record_info(dispatcher):
+    try:
+        return _dispatcher_record_info[dispatcher]
+    except KeyError:
+        try:
+            parameters = inspect.signature(dispatcher).parameters.values()
+        except (TypeError, ValueError):
+            accepts = False
+        else:
+            names = {p.name for p in parameters}
+            accepts = {'record_name', 'priority'} <= names or any(
+                p.kind == p.VAR_KEYWORD for p in parameters)
+        _dispatcher_record_info[dispatcher] = accepts
+        return accepts
+
 # Global blocking flag, used to mark asynchronous (False) or synchronous (True)
 # processing modes for Out records.
 # Default False to maintain behaviour from previous versions.
@@ -38,6 +84,9 @@ EPICS_OK = 0
 EPICS_ERROR = 1
 NO_CONVERT = 2
 
+# Value of the SCAN field for I/O Intr records.
+SCAN_IO_INTR = 2
+
 
 class ProcessDeviceSupportCore(DeviceSupportCore, RecordLookup):
     '''Implements canonical default processing for records with a _process
@@ -57,7 +106,16 @@ class ProcessDeviceSupportCore(DeviceSupportCore, RecordLookup):
     def __init__(self, name, **kargs):
         autosave_fields = kargs.pop("autosave", None)
         autosave.add_pv_to_autosave(self, name, autosave_fields)
+        # Field name lookups are cached as dbAddr handles, see _dbaddr.
+        self.__dbaddrs = {}
         super().__init__(name, **kargs)
+        # A saved value replaces the initial value
+        autosave.restore_saved_value(self, name)
+
+    def _restore_value(self, value):
+        '''Replaces the initial value with a value restored by autosave.'''
+        self._set_epics_value(
+            self._value_to_epics(value), alarm.NO_ALARM, alarm.NO_ALARM, None)
 
     # Most subclasses (all except waveforms) define a ctypes constructor for the
     # underlying EPICS compatible value.
@@ -89,14 +147,24 @@ class ProcessDeviceSupportCore(DeviceSupportCore, RecordLookup):
     def _write_value(self, record, value):
         record.write_val(value)
 
+    def _dbaddr(self, field):
+        '''Returns a dbAddr handle for the given field of this record, resolving
+        the field name on first use only.'''
+        try:
+            return self.__dbaddrs[field]
+        except KeyError:
+            dbaddr = db_name_to_addr(self._name + '.' + field)
+            self.__dbaddrs[field] = dbaddr
+            return dbaddr
+
     def get_field(self, field):
         ''' Returns the given field value as a string.'''
         assert hasattr(self, "_record"), \
             'get_field may only be called after iocInit'
 
         data = (c_char * 40)()
-        name = self._name + '.' + field
-        db_get_field(name, fields.DBF_STRING, addressof(data), 1)
+        db_get_field(
+            self._dbaddr(field), fields.DBF_STRING, addressof(data), 1)
         return _string_at(data, 40)
 
     def set_field(self, field, value):
@@ -107,10 +175,10 @@ class ProcessDeviceSupportCore(DeviceSupportCore, RecordLookup):
 
         data = (c_char * 40)()
         data.value = str(value).encode() + b'\0'
-        name = self._name + '.' + field
-        db_put_field_process(name, fields.DBF_STRING, addressof(data), 1, True)
+        db_put_field_process(
+            self._dbaddr(field), fields.DBF_STRING, addressof(data), 1, True)
 
-class ProcessDeviceSupportIn(ProcessDeviceSupportCore):
+class ProcessDeviceSupportIn(OverflowPolicy, ProcessDeviceSupportCore):
     _link_ = 'INP'
 
     def __init__(self, name, **kargs):
@@ -127,28 +195,118 @@ class ProcessDeviceSupportIn(ProcessDeviceSupportCore):
         #    The tuple contains everything needed to be written: the value,
         # severity, alarm and optional timestamp.
         self._value = (value, alarm.NO_ALARM, alarm.UDF_ALARM, None)
+
+        self._init_overflow(
+            kargs.pop('overflow_policy', 'drop'),
+            kargs.pop('overflow_timeout', 1.0))
+
+        # Callbacks to be called when the record next processes, used by
+        # set_async and set_and_wait.
+        self.__processed = []
+        self.__processed_lock = threading.Lock()
         super().__init__(name, **kargs)
 
     def _process(self, record):
         # For input process we copy the value stored in the instance to the
         # record.  The alarm status is also updated, and a custom timestamp
         # can also be set.
-        value, severity, alarm, timestamp = self._value
-        self._write_value(record, value)
+        value, severity, alarm, timestamp = self._write_latest(record)
         self.process_severity(record, severity, alarm)
         if timestamp is not None:
             record.TIME = timestamp
         record.UDF = 0
+        if self.__processed:
+            with self.__processed_lock:
+                processed = self.__processed
+                self.__processed = []
+            for callback in processed:
+                # Every waiter must be released, even if another fails.
+                try:
+                    callback()
+                except Exception:
+                    logging.exception(
+                        'Exception notifying processing of %s', self.name)
         return self._epics_rc_
 
+    def _write_latest(self, record):
+        '''Writes the latest value to the record, returning the complete
+        (value, severity, alarm, timestamp) tuple written.'''
+        latest = self._value
+        self._write_value(record, latest[0])
+        return latest
+
+    def _queue_full(self):
+        # A request for a running I/O Intr record also fails while scanning is
+        # paused, so check the queue itself.
+        return bool(interruptAccept.value) and hasattr(self, '_record') and \
+            self._record.SCAN == SCAN_IO_INTR and \
+            _callback_queue_full(self._record.PRIO)
+
+    def __set_notify(self, processed, value, severity, alarm, timestamp):
+        '''As for set(), but calls processed() once the record has processed
+        the new value, or at once if the record will not be processed.'''
+        self._set_epics_value(
+            self._value_to_epics(value), severity, alarm, timestamp)
+        with self.__processed_lock:
+            self.__processed.append(processed)
+        if not self.trigger():
+            with self.__processed_lock:
+                try:
+                    self.__processed.remove(processed)
+                except ValueError:
+                    # Processing for an earlier trigger got there first
+                    return
+            processed()
+
+    async def set_async(self, value,
+                        severity=alarm.NO_ALARM, alarm=alarm.NO_ALARM,
+                        timestamp=None):
+        '''As for set(), but returns once the record has processed the new
+        value.  This happens as the value is written to the record, so
+        monitors may be posted to clients after this returns.  If the record
+        is not I/O Intr scanned, or the IOC is not yet running, this returns
+        immediately.'''
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def processed():
+            loop.call_soon_threadsafe(
+                lambda: done.done() or done.set_result(None))
+        self.__set_notify(processed, value, severity, alarm, timestamp)
+        await done
+
+    def set_and_wait(self, value,
+                     severity=alarm.NO_ALARM, alarm=alarm.NO_ALARM,
+                     timestamp=None, timeout=None):
+        '''The `cothread` equivalent of set_async(): updates the value and
+        suspends the calling cothread until the record has processed it, or
+        until the timeout expires.'''
+        import cothread
+        done = cothread.Event()
+        self.__set_notify(
+            lambda: cothread.Callback(done.Signal),
+            value, severity, alarm, timestamp)
+        done.Wait(timeout)
+
     def set(self, value,
             severity=alarm.NO_ALARM, alarm=alarm.NO_ALARM, timestamp=None):
         '''Updates the stored value and triggers an update.  The alarm
         severity and timestamp can also be specified if appropriate.'''
-        value = self._value_to_epics(value)
-        self._value = (value, severity, alarm, timestamp)
+        self._set_converted(
+            self._value_to_epics(value), severity, alarm, timestamp)
+
+    def _set_converted(self, value,
+                       severity=alarm.NO_ALARM, alarm=alarm.NO_ALARM,
+                       timestamp=None):
+        self._set_epics_value(value, severity, alarm, timestamp)
         self.trigger()
 
+    def _set_epics_value(self, value, severity, alarm, timestamp):
+        '''Stores a value already converted by _value_to_epics without
+        triggering an update.'''
+        self._value = (value, severity, alarm, timestamp)
+        autosave.mark_dirty(self._name)
+
     def set_alarm(self, severity, alarm, timestamp=None):
         '''Updates the alarm status without changing the stored value.  An
         update is triggered, and a timestamp can optionally be specified.'''
@@ -160,6 +318,39 @@ class ProcessDeviceSupportIn(ProcessDeviceSupportCore):
         return self._epics_to_value(self._value[0])
 
 
+def set_many(updates,
+             severity=alarm.NO_ALARM, alarm=alarm.NO_ALARM, timestamp=None):
+    '''Updates the values of many IN records together.  updates is either a
+    dictionary or a sequence of (record, value) pairs.  All of the records
+    are checked and all of the values converted before any record is updated,
+    and then processing is triggered for every updated record in a single
+    call.  If the callback queue is full the overflow policy of each affected
+    record is applied.  The alarm severity and timestamp apply to all of the
+    records.'''
+    if hasattr(updates, 'items'):
+        updates = updates.items()
+    updates = list(updates)
+    for record, _ in updates:
+        # Records are usually wrapped by the builder, so check what they do.
+        assert hasattr(record, '_overflow'), \
+            'set_many can only update IN records, not %s' % record
+    updates = [
+        (record, record._value_to_epics(value)) for record, value in updates]
+
+    # Records sharing an IOSCANPVT only need to be triggered once, and the
+    # first record given for each is responsible for its overflow.
+    ioscanpvts = {}
+    for record, value in updates:
+        record._set_epics_value(value, severity, alarm, timestamp)
+        ioscanpvt = record._get_ioscanpvt()
+        if ioscanpvt:
+            ioscanpvts.setdefault(ioscanpvt, record)
+    results = scan_io_request_many(list(ioscanpvts))
+    for record, queued in zip(ioscanpvts.values(), results):
+        if not queued:
+            record._overflow()
+
+
 class ProcessDeviceSupportOut(ProcessDeviceSupportCore):
     _link_ = 'OUT'
 
@@ -179,6 +370,29 @@ class ProcessDeviceSupportOut(ProcessDeviceSupportCore):
         self.__validate = kargs.pop('validate', None)
         self.__always_update = kargs.pop('always_update', False)
 
+        # on_update can be run on a record specific executor instead of by the
+        # global dispatcher.
+        on_update_executor = kargs.pop('on_update_executor', None)
+        if on_update_executor is None:
+            self.__dispatcher = None
+        else:
+            self.__dispatcher = _executor_dispatcher(on_update_executor)
+
+        # When coalescing, at most one on_update call is queued at a time and
+        # it is passed the latest value written when it runs.
+        self.__coalesce = kargs.pop('coalesce', False)
+        assert not (self.__coalesce and isinstance(
+                on_update_executor, concurrent.futures.ProcessPoolExecutor)), \
+            'Cannot coalesce updates run in a process pool'
+        # The wrapper for on_update_name cannot be pickled
+        assert not (on_update_name and isinstance(
+                on_update_executor, concurrent.futures.ProcessPoolExecutor)), \
+            'Cannot use on_update_name with a process pool'
+        if self.__coalesce:
+            self.__latest_lock = threading.Lock()
+            self.__latest = None
+            self.__latest_queued = False
+
         if 'initial_value' in kargs:
             value = self._value_to_epics(kargs.pop('initial_value'))
             initial_severity = alarm.NO_ALARM
@@ -215,6 +429,10 @@ class ProcessDeviceSupportOut(ProcessDeviceSupportCore):
         recGblResetAlarms(record)
         return self._epics_rc_
 
+    def _restore_value(self, value):
+        self._value = (
+            self._value_to_epics(value), alarm.NO_ALARM, alarm.NO_ALARM)
+
     def __completion(self, record):
         '''Signals that all on_update processing is finished'''
         if self._blocking:
@@ -246,17 +464,54 @@ class ProcessDeviceSupportOut(ProcessDeviceSupportCore):
         else:
             # Value is good.  Hang onto it, let users know the value has changed
             self._value = (value, severity, alarm)
+            autosave.mark_dirty(self._name)
             record.UDF = 0
             if self.__on_update:
                 record.PACT = self._blocking
-                dispatcher(
-                    self.__on_update,
-                    func_args=(python_value,),
-                    completion = self.__completion,
-                    completion_args=(record,))
+                if self.__coalesce:
+                    self.__dispatch_latest(record, python_value)
+                else:
+                    self.__dispatch(
+                        record, self.__on_update, func_args=(python_value,))
 
             return EPICS_OK
 
+    def __dispatch(self, record, func, func_args=()):
+        '''Dispatches func, together with the record name and priority if the
+        dispatcher accepts them.'''
+        dispatch = self.__dispatcher or dispatcher
+        if _accepts_record_info(dispatch):
+            dispatch(
+                func,
+                func_args=func_args,
+                completion = self.__completion,
+                completion_args=(record,),
+                record_name = self._name,
+                priority = record.PRIO)
+        else:
+            dispatch(
+                func,
+                func_args=func_args,
+                completion = self.__completion,
+                completion_args=(record,))
+
+    def __dispatch_latest(self, record, python_value):
+        '''Coalescing dispatch: replaces the value for any call still waiting
+        to run, and only dispatches a new call if there isn't one.'''
+        with self.__latest_lock:
+            self.__latest = python_value
+            queued = self.__latest_queued
+            self.__latest_queued = True
+        if not queued:
+            self.__dispatch(record, self.__on_update_latest)
+
+    def __on_update_latest(self):
+        with self.__latest_lock:
+            value = self.__latest
+            self.__latest = None
+            self.__latest_queued = False
+        return self.__on_update(value)
+
 
     def _value_to_dbr(self, value):
         return self._dbf_type_, 1, addressof(value), value
@@ -275,13 +530,16 @@ class ProcessDeviceSupportOut(ProcessDeviceSupportCore):
     def set(self, value, process=True,
             severity=alarm.NO_ALARM, alarm=alarm.NO_ALARM):
         '''Special routine to set the value directly.'''
-        value = self._value_to_epics(value)
-        try:
-            _record = self._record
-        except AttributeError:
+        self._set_converted(
+            self._value_to_epics(value), process, severity, alarm)
+
+    def _set_converted(self, value, process=True,
+                       severity=alarm.NO_ALARM, alarm=alarm.NO_ALARM):
+        if not hasattr(self, '_record'):
             # Record not initialised yet. Record data for when
             # initialisation occurs
             self._value = (value, severity, alarm)
+            autosave.mark_dirty(self._name)
         else:
             # The array parameter is used to keep the raw pointer alive
             dbf_code, length, data, array = self._value_to_dbr(value)
@@ -292,8 +550,10 @@ class ProcessDeviceSupportOut(ProcessDeviceSupportCore):
             # Python and EPICS values in line
             if not process:
                 self._value = (value, severity, alarm)
+                autosave.mark_dirty(self._name)
 
-            db_put_field_process(_record.NAME, dbf_code, data, length, process)
+            db_put_field_process(
+                self._dbaddr('VAL'), dbf_code, data, length, process)
 
     def get(self):
         return self._epics_to_value(self._value[0])
@@ -400,6 +660,129 @@ class ao(ProcessDeviceSupportOut):
     _ctype_ = c_double
     _dbf_type_ = fields.DBF_DOUBLE
 
+
+class RecordBlock(IoScanGroup):
+    '''A block of scalar IN records whose values are held together in a single
+    numpy array.  Records in the block share one IOSCANPVT, so updating the
+    block is a single array assignment followed by a single trigger.'''
+
+    def __init__(self, values,
+                 overflow_policy = 'drop', overflow_timeout = 1.0):
+        self.values = values
+        self.records = []
+        # Names of the records whose values are tracked by autosave, filled in
+        # as the records are created so that trigger() has no per record work
+        # to do when there are none.
+        self._autosaved = []
+        # The alarm state and timestamp are shared by the whole block and are
+        # updated together as a single tuple, as for ProcessDeviceSupportIn.
+        self._state = (alarm.NO_ALARM, alarm.UDF_ALARM, None)
+        super().__init__(overflow_policy, overflow_timeout)
+
+    def set(self, values,
+            severity=alarm.NO_ALARM, alarm=alarm.NO_ALARM, timestamp=None):
+        '''Updates all of the values in the block and triggers an update.'''
+        self.values[:] = values
+        self._state = (severity, alarm, timestamp)
+        self.trigger()
+
+    def set_alarm(self, severity, alarm, timestamp=None):
+        '''Updates the alarm status of the block without changing its values.'''
+        self._state = (severity, alarm, timestamp)
+        self.trigger()
+
+    def trigger(self):
+        '''Triggers processing of every record in the block.  This must be
+        called after updating values in place, which also ensures that
+        autosave sees the new values.'''
+        if self._autosaved:
+            autosave.mark_dirty(*self._autosaved)
+        return super().trigger()
+
+    def get(self):
+        '''Returns a copy of the current values in the block.'''
+        return self.values.copy()
+
+
+class ProcessDeviceSupportInBlock(ProcessDeviceSupportCore):
+    '''Device support for a single scalar IN record of a RecordBlock.  The
+    value of the record is the element of the block array at its index, and
+    its alarm state, timestamp and overflow policy are those of the block.
+    Only set(), get() and trigger() are supported from ProcessDeviceSupportIn,
+    use the RecordBlock to change the alarm state.'''
+    _link_ = 'INP'
+    _fields_ = ['UDF', 'VAL']
+
+    def __init__(self, name, _block, _block_index, **kargs):
+        self._block = _block
+        self._index = _block_index
+        _block.records.append(self)
+        super().__init__(name, scan_group = _block, **kargs)
+        if autosave.is_tracked(name):
+            _block._autosaved.append(name)
+
+    def _process(self, record):
+        severity, alarm, timestamp = self._block._state
+        record.VAL = self._block.values[self._index]
+        self.process_severity(record, severity, alarm)
+        if timestamp is not None:
+            record.TIME = timestamp
+        record.UDF = 0
+        return self._epics_rc_
+
+    def _value_to_epics(self, value):
+        return self._block.values.dtype.type(value)
+
+    def _restore_value(self, value):
+        # Only the value is restored, the alarm state belongs to the block.
+        self._block.values[self._index] = self._value_to_epics(value)
+
+    def _set_epics_value(self, value, severity, alarm, timestamp):
+        # Only used by set_many, whose alarm state applies to every record
+        # given and so here to the whole block.
+        self._block.values[self._index] = value
+        self._block._state = (severity, alarm, timestamp)
+        autosave.mark_dirty(self._name)
+
+    def _overflow(self):
+        return self._block._overflow()
+
+    def set(self, value):
+        '''Updates this record's value in the block, leaving the alarm state of
+        the block unchanged, and triggers an update of the whole block.'''
+        self._block.values[self._index] = self._value_to_epics(value)
+        self.trigger()
+
+    def trigger(self):
+        '''Triggers processing of the whole block, as for RecordBlock.'''
+        return self._block.trigger()
+
+    def get(self):
+        return self._block.values[self._index].item()
+
+class longin_block(ProcessDeviceSupportInBlock):
+    _record_type_ = 'longin'
+    _device_name_ = 'devPython_longin_block'
+    _epics_rc_ = EPICS_OK
+
+class int64in_block(ProcessDeviceSupportInBlock):
+    _record_type_ = 'int64in'
+    _device_name_ = 'devPython_int64in_block'
+    _epics_rc_ = EPICS_OK
+
+class ai_block(ProcessDeviceSupportInBlock):
+    _record_type_ = 'ai'
+    _device_name_ = 'devPython_ai_block'
+    _dset_extra_ = dset_process_linconv
+    _epics_rc_ = NO_CONVERT
+
+    def _process(self, record):
+        result = super()._process(record)
+        # As for ai, we return NO_CONVERT so must update .UDF ourself.
+        record.UDF = int(numpy.isnan(record.VAL))
+        return result
+
+
 def to_epics_str_array(value):
     """Convert the given array of Python strings to an array of EPICS
     nul-terminated strings"""
@@ -483,6 +866,35 @@ class WaveformBase(ProcessDeviceSupportCore):
         value.flags.writeable = False
         return value
 
+    def _adopt_value(self, value):
+        # Used instead of _value_to_epics when the caller hands over ownership
+        # of the array: no copy is taken, instead the array is frozen.  This is
+        # only safe if the array owns its data or is already read-only, as
+        # otherwise it could still be changed through another view.
+        assert isinstance(value, numpy.ndarray) and \
+            value.dtype == self._dtype and value.ndim == 1 and \
+            value.flags.c_contiguous, \
+            'Can only set contiguous %s arrays without copying' % self._dtype
+        assert len(value) <= self._nelm, 'Value too long for waveform'
+        if value.base is None:
+            value.flags.writeable = False
+            return value
+        elif not value.flags.writeable:
+            return value
+        else:
+            return self._value_to_epics(value)
+
+    def set(self, value, *args, copy=True, **kargs):
+        '''Updates the waveform value.  If copy=False is passed then ownership
+        of value, which must be a contiguous array of the waveform dtype, is
+        passed to the record and the array is made read-only instead of being
+        copied.  A writeable view of another array is still copied.'''
+        if copy:
+            value = self._value_to_epics(value)
+        else:
+            value = self._adopt_value(value)
+        self._set_converted(value, *args, **kargs)
+
     def _epics_to_value(self, value):
         if self._dtype.char == 'S':
             return [_string_at(s, 40) for s in value]
@@ -497,6 +909,130 @@ class waveform(WaveformBase, ProcessDeviceSupportIn):
     _record_type_ = 'waveform'
     _device_name_ = 'devPython_waveform'
 
+    def __init__(self, name, double_buffer=False, **kargs):
+        # When double buffering, set() copies the new value into a spare
+        # buffer of the size of the record's own buffer, and processing just
+        # swaps the two buffers over.  This keeps the copy out of the EPICS
+        # scan threads.
+        self.__double_buffer = double_buffer
+        self.__staged = None
+        # For partial updates by set_slice() and append() the value is held
+        # in a private record sized working buffer, and __pending records the
+        # range of BPTR which is out of date, or None if all of it is.
+        self.__buffer = None
+        self.__pending = None
+        # Set when get() may have handed out a view of __buffer, in which case
+        # the next partial update copies the waveform into a new buffer.
+        self.__shared = False
+        # Guards all of the above against concurrent record processing.
+        self.__lock = threading.Lock()
+        super().__init__(name, **kargs)
+
+    def init_record(self, record):
+        if self.__double_buffer:
+            self.__spare = numpy.empty(self._nelm, dtype = self._dtype)
+            # Address of the buffer not currently published in BPTR.
+            self.__inactive = self.__spare.ctypes.data
+        return super().init_record(record)
+
+    def __stage(self, value):
+        # Must be called with the lock held.  Copies the complete value into
+        # the inactive buffer when double buffering once the record exists.
+        if self.__double_buffer and hasattr(self, '_record'):
+            memmove(
+                self.__inactive, value.ctypes.data_as(c_void_p),
+                self._dtype.itemsize * len(value))
+            self.__staged = len(value)
+
+    def _set_epics_value(self, value, severity, alarm, timestamp):
+        with self.__lock:
+            self.__stage(value)
+            self.__pending = None
+            self._value = (value, severity, alarm, timestamp)
+        autosave.mark_dirty(self._name)
+
+    def set_slice(self, start, data,
+                  severity=alarm.NO_ALARM, alarm=alarm.NO_ALARM,
+                  timestamp=None):
+        '''Overwrites the waveform from index start with data, extending the
+        waveform if necessary, and triggers an update.  Only the updated part
+        of the waveform is copied, unless get() has been called since the last
+        partial update, when the whole waveform is copied to a new buffer so
+        that arrays already returned are not changed.'''
+        data = _require_waveform(data, self._dtype)
+        end = start + len(data)
+        with self.__lock:
+            current = self._value[0]
+            assert 0 <= start <= len(current), 'Slice not within waveform'
+            assert end <= self._nelm, 'Value too long for waveform'
+
+            if self.__buffer is None or self.__shared:
+                self.__buffer = numpy.empty(self._nelm, dtype = self._dtype)
+                self.__shared = False
+            if current.base is not self.__buffer:
+                # The first partial update after a complete one has to bring
+                # the working buffer up to date.
+                self.__buffer[:len(current)] = current
+            self.__buffer[start:end] = data
+            value = self.__buffer[:max(end, len(current))]
+            value.flags.writeable = False
+
+            if self.__double_buffer:
+                self.__stage(value)
+            elif self.__pending is not None:
+                lo, hi = self.__pending
+                if lo < hi:
+                    self.__pending = (min(lo, start), max(hi, end))
+                else:
+                    self.__pending = (start, end)
+            self._value = (value, severity, alarm, timestamp)
+        autosave.mark_dirty(self._name)
+        self.trigger()
+
+    def append(self, data,
+               severity=alarm.NO_ALARM, alarm=alarm.NO_ALARM, timestamp=None):
+        '''Appends data to the end of the waveform and triggers an update.  If
+        the waveform would become longer than its length the oldest values are
+        discarded, in which case the whole waveform is copied.'''
+        data = _require_waveform(data, self._dtype)
+        current = self._value[0]
+        if len(current) + len(data) <= self._nelm:
+            self.set_slice(len(current), data, severity, alarm, timestamp)
+        else:
+            self.set(
+                numpy.concatenate((current, data))[-self._nelm:],
+                severity, alarm, timestamp)
+
+    def _write_latest(self, record):
+        # The state is read under the lock, so that the value written agrees
+        # with the staged buffer and the pending range as well as with the
+        # alarm state and timestamp processed with it.
+        with self.__lock:
+            latest = self._value
+            value = latest[0]
+            if self.__staged is not None:
+                record.BPTR, self.__inactive = self.__inactive, record.BPTR
+                record.NORD = self.__staged
+                self.__staged = None
+            elif self.__pending is None:
+                super()._write_value(record, value)
+            else:
+                lo, hi = self.__pending
+                if lo < hi:
+                    size = self._dtype.itemsize
+                    memmove(
+                        record.BPTR + lo * size,
+                        value.ctypes.data + lo * size, (hi - lo) * size)
+                record.NORD = len(value)
+            self.__pending = (0, 0)
+        return latest
+
+    def get(self):
+        with self.__lock:
+            value = self._value[0]
+            self.__shared = True
+        return self._epics_to_value(value)
+
 class waveform_out(WaveformBase, ProcessDeviceSupportOut):
     _record_type_ = 'waveform'
     _device_name_ = 'devPython_waveform_out'
@@ -1,5 +1,10 @@
 from __future__ import print_function
 
+import asyncio
+import logging
+import threading
+import time
+
 from . import imports
 from .fields import RecordFactory
 from ctypes import *
@@ -32,6 +37,137 @@ class DSET_BASE(Structure):
 
 
 
+# What IN records and scan groups do with an update when the EPICS callback
+# queue is full.
+OVERFLOW_POLICIES = ['drop', 'block', 'coalesce']
+
+
+class _TriggerRetries:
+    '''Retries processing of IN records and scan groups using the coalesce
+    overflow policy until the callback queue has room.  The records keep only
+    their latest value, so it is this value which is processed.'''
+
+    # Interval between attempts, in seconds
+    INTERVAL = 0.01
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        # Records waiting to be retried, used as an ordered set
+        self.__pending = {}
+        self.__running = False
+
+    def add(self, record):
+        '''Adds a record to be retried, returns False if it was already
+        waiting.'''
+        with self.__lock:
+            if record in self.__pending:
+                return False
+            self.__pending[record] = None
+            if not self.__running:
+                self.__running = True
+                threading.Thread(target = self.__retry, daemon = True).start()
+            return True
+
+    def __retry(self):
+        while True:
+            time.sleep(self.INTERVAL)
+            with self.__lock:
+                pending = list(self.__pending)
+            for record in pending:
+                if record._request_scan() or not record._queue_full():
+                    # Either processed, or no longer able to be processed
+                    with self.__lock:
+                        del self.__pending[record]
+                else:
+                    # The queue is still full, so try again next time
+                    break
+            with self.__lock:
+                if not self.__pending:
+                    self.__running = False
+                    return
+
+_trigger_retries = _TriggerRetries()
+
+
+def _callback_queue_full(priority = None):
+    '''Returns whether the EPICS callback queue of the given priority, or of
+    any priority if None, is full.  Only valid once the IOC is running.'''
+    status = imports.callbackQueueStats()
+    imports.callbackQueueStatus(0, byref(status))
+    if priority is None:
+        used = max(status.numUsed)
+    else:
+        used = status.numUsed[priority]
+    return used >= status.size
+
+
+def _on_event_loop():
+    '''Returns whether the calling thread is running an asyncio event loop.'''
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    else:
+        return True
+
+
+class OverflowPolicy:
+    '''Implements trigger() for IN records and scan groups, applying the
+    chosen overflow policy when processing cannot be queued because the EPICS
+    callback queue is full.  Subclasses call _init_overflow() and implement
+    _request_scan(), returning the result of scanIoRequest, and _queue_full().
+    '''
+
+    def _init_overflow(self, overflow_policy, overflow_timeout):
+        assert overflow_policy in OVERFLOW_POLICIES, \
+            'Invalid overflow_policy %r' % overflow_policy
+        self.__overflow_policy = overflow_policy
+        self.__overflow_timeout = overflow_timeout
+        # Count of updates lost because the callback queue was full
+        self.dropped_updates = 0
+
+    def trigger(self):
+        '''Triggers processing if I/O Intr scanned.  Returns True if
+        processing was queued, or with the coalesce overflow policy will be
+        retried.  If the EPICS callback queue is full then the overflow_policy
+        given on creation is applied.'''
+        return bool(self._request_scan()) or self._overflow()
+
+    def _overflow(self):
+        '''Called when a request for processing has not been queued.  Applies
+        the overflow policy if this is because the queue is full, and returns
+        True if processing will be retried.'''
+        if not self._queue_full():
+            return False
+        elif self.__overflow_policy == 'coalesce':
+            if not _trigger_retries.add(self):
+                # The update waiting to be retried has been replaced
+                self.__dropped()
+            return True
+        elif self.__overflow_policy == 'block':
+            # Waiting here would stop the event loop from running, and so
+            # from making room in the queue.
+            assert not _on_event_loop(), \
+                'Cannot block on a full callback queue in an event loop'
+            deadline = time.monotonic() + self.__overflow_timeout
+            delay = 1e-4
+            while time.monotonic() < deadline:
+                time.sleep(delay)
+                delay = min(2 * delay, _TriggerRetries.INTERVAL)
+                if self._request_scan():
+                    return True
+        self.__dropped()
+        return False
+
+    def __dropped(self):
+        self.dropped_updates += 1
+        if self.dropped_updates == 1:
+            logging.warning(
+                'Callback queue full, dropped update for %s.  Further drops '
+                'are counted in dropped_updates',
+                getattr(self, 'name', type(self).__name__))
+
+
 class DeviceSupportCore(DeviceCommon):
     '''Implementation of core record device support including registration
     with EPICS of the device support table.'''
@@ -39,6 +175,12 @@ class DeviceSupportCore(DeviceCommon):
     # The following fields are used for all records.
     __preset_fields = ['DPVT', 'NAME', 'NSTA', 'NSEV', 'TIME']
 
+    # Maps each raw record pointer to its (instance, wrapped record) pair.
+    # Filled in by _init_record so that record callbacks don't need to wrap
+    # the record on every call.  This is shared among all subclasses.  Note
+    # that DPVT is reserved for the binding used by the process trampoline.
+    __bindings = {}
+
 
     # ------------------------------------------------------------------------
     # Generic support for binding subclasses of this class to the EPICS
@@ -77,7 +219,12 @@ class DeviceSupportCore(DeviceCommon):
             list(zip(DSET._fields_, DSET._record_offsets_))
         for (method_name, method_type), record_offset in zip_list:
             method = getattr(cls, '_' + method_name, None)
-            if method:
+            if method and method_name == 'process':
+                # Record processing is the hot path, so it is dispatched by a
+                # C trampoline calling the method bound by _init_record.
+                callback = method_type(imports.get_process_trampoline())
+                setattr(dset, method_name, callback)
+            elif method:
                 # Convert each implemented method into a suitable callback
                 # function and add it to the dset we're about to publish.
                 callback = method_type(
@@ -112,17 +259,17 @@ class DeviceSupportCore(DeviceCommon):
         by __create_method() above), but not to the instance.  We find the
         instance in the record and dispatch to the bound instance method here.
         '''
-        # Convert the raw record pointer into a wrapped record and try to
-        # find the associated instance.
-        record = cls.__fields(args[record_offset])
-        self = record.DPVT
-        if self is None:
+        # Look up the instance and wrapped record bound to this record pointer
+        # by _init_record.
+        try:
+            self, record = cls.__bindings[args[record_offset]]
+        except KeyError:
+            record = cls.__fields(args[record_offset])
             print('Record', record.NAME, 'called with no binding')
             return 1
         else:
             args = list(args)
             args[record_offset] = record
-            self = cast(self, py_object).value
             return method(self, *args)
 
 
@@ -140,12 +287,15 @@ class DeviceSupportCore(DeviceCommon):
     def _init_record(cls, record):
         '''This is called for each new record.  We bind the record to its
         instance and call any local initialisation.'''
+        pointer = record
         record = cls.__fields(record)
         # Here we ask for an instance of the record.  It's the responsibility
         # of the subclass to provide a suitable implementation here.
         self = cls.LookupRecord(getattr(record, cls._link_))
 
-        record.DPVT = id(self)
+        cls.__bindings[pointer] = (self, record)
+        if hasattr(cls, '_process'):
+            imports.bind_record_process(record, self._process)
         self._record = record
         self.name = record.NAME
         return self.init_record(record)
@@ -153,8 +303,13 @@ class DeviceSupportCore(DeviceCommon):
     def __init__(self, name, **kargs):
         # We won't initialise the IOSCANPVT until it's actually requested by
         # a call to get_ioinit_info.  This is only a trivial attempt to
-        # reduce resource consumption.
-        self.__ioscanpvt = imports.IOSCANPVT()
+        # reduce resource consumption.  Records in a scan group share the
+        # IOSCANPVT of their group instead.
+        scan_group = kargs.pop('scan_group', None)
+        if scan_group is None:
+            self.__ioscanpvt = imports.IOSCANPVT()
+        else:
+            self.__ioscanpvt = scan_group._ioscanpvt
         super().__init__(name, **kargs)
 
 
@@ -182,9 +337,48 @@ class DeviceSupportCore(DeviceCommon):
             record.NSTA = alarm
 
     def trigger(self):
-        '''Call this to trigger processing for records with I/O Intr scan.'''
+        '''Call this to trigger processing for records with I/O Intr scan.
+        Returns True if processing was queued.'''
+        return bool(self._request_scan())
+
+    def _request_scan(self):
+        '''Requests I/O Intr processing, returning the result of
+        scanIoRequest.'''
         if self.__ioscanpvt:
-            imports.scanIoRequest(self.__ioscanpvt)
+            return imports.scanIoRequest(self.__ioscanpvt)
+        else:
+            return 0
+
+    def _get_ioscanpvt(self):
+        '''Returns the address of the IOSCANPVT used by trigger(), or None if
+        the record is not set up for I/O Intr scanning.'''
+        return self.__ioscanpvt.value
+
+
+
+class IoScanGroup(OverflowPolicy):
+    '''A group of records sharing a single IOSCANPVT.  Records join a group
+    when they are created by passing scan_group=group, after which a single
+    call to trigger() queues processing of every record in the group.  Note
+    that triggering any one record in a group triggers the whole group.  The
+    overflow_policy applies to trigger() on the group itself.'''
+
+    def __init__(self, overflow_policy = 'drop', overflow_timeout = 1.0):
+        # As for DeviceSupportCore, this is initialised when first requested
+        # by the get_ioinit_info call of one of the records in the group.
+        self._ioscanpvt = imports.IOSCANPVT()
+        self._init_overflow(overflow_policy, overflow_timeout)
+
+    def _request_scan(self):
+        if self._ioscanpvt:
+            return imports.scanIoRequest(self._ioscanpvt)
+        else:
+            return 0
+
+    def _queue_full(self):
+        # The priorities of the records in the group aren't known here, so
+        # any full queue counts.
+        return bool(imports.interruptAccept.value) and _callback_queue_full()
 
 
 
@@ -213,4 +407,4 @@ LookupRecord = RecordLookup.LookupRecord
 LookupRecordList = RecordLookup._RecordDirectory.items
 
 
-__all__ = ['LookupRecord', 'LookupRecordList']
+__all__ = ['LookupRecord', 'LookupRecordList', 'IoScanGroup']
@@ -0,0 +1,193 @@
+import bisect
+import threading
+import time
+
+import numpy
+
+
+class Histogram:
+    '''Histogram of durations in seconds.  ``counts[i]`` is the number of
+    durations no longer than ``LIMITS[i]``, and not counted in an earlier
+    bucket; the last entry of ``counts`` counts all longer durations.'''
+
+    # Upper limits of the histogram buckets in seconds
+    LIMITS = (1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1, 10)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.LIMITS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, duration):
+        self.counts[bisect.bisect_left(self.LIMITS, duration)] += 1
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+
+class CallbackStats:
+    '''Statistics for the callbacks run by a dispatcher, either for a single
+    record or for all callbacks.
+
+    ``wait`` is a `Histogram` of the time from a callback being dispatched to
+    it starting to run, and ``duration`` of the time it then took to complete.
+    ``queued`` counts callbacks waiting to run, ``in_flight`` counts callbacks
+    dispatched but not yet complete, and ``exceptions`` counts callbacks which
+    raised an exception.'''
+
+    def __init__(self):
+        self.wait = Histogram()
+        self.duration = Histogram()
+        self.queued = 0
+        self.in_flight = 0
+        self.exceptions = 0
+
+
+class DispatcherStats:
+    '''Collects `CallbackStats` for the callbacks run by a dispatcher.
+    ``total`` covers all callbacks, and ``records`` maps the name of each
+    record which has had an `on_update` callback to its own statistics.
+
+    Dispatchers which run callbacks in batches also count the ``batches`` run,
+    the ``limited_batches`` which stopped at the dispatcher's limits with
+    callbacks still waiting, and the largest batch in ``max_batch``.'''
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.total = CallbackStats()
+        self.records = {}
+        self.batches = 0
+        self.limited_batches = 0
+        self.max_batch = 0
+
+    def dispatched(self, record_name=None):
+        '''Called when a callback is dispatched, returns a token to be passed
+        to `started` and `finished`.'''
+        with self.__lock:
+            if record_name is None:
+                stats = (self.total,)
+            else:
+                try:
+                    record = self.records[record_name]
+                except KeyError:
+                    record = CallbackStats()
+                    self.records[record_name] = record
+                stats = (self.total, record)
+            for s in stats:
+                s.queued += 1
+                s.in_flight += 1
+        return (stats, time.monotonic())
+
+    def started(self, token):
+        '''Called when a callback starts to run.'''
+        stats, dispatched = token
+        now = time.monotonic()
+        with self.__lock:
+            for s in stats:
+                s.queued -= 1
+                s.wait.add(now - dispatched)
+        return (stats, now)
+
+    def finished(self, token, failed=False):
+        '''Called with the token returned by `started` when a callback has
+        completed, successfully or otherwise.'''
+        stats, started = token
+        now = time.monotonic()
+        with self.__lock:
+            for s in stats:
+                s.in_flight -= 1
+                s.duration.add(now - started)
+                if failed:
+                    s.exceptions += 1
+
+    def batch(self, size, limited=False):
+        '''Called when a batch of ``size`` callbacks has been run, with
+        ``limited`` set if callbacks were left waiting.'''
+        with self.__lock:
+            self.batches += 1
+            if limited:
+                self.limited_batches += 1
+            self.max_batch = max(self.max_batch, size)
+
+    def create_records(self, prefix='DISPATCHER', interval=1.0):
+        '''Creates records publishing the ``total`` statistics, updated every
+        ``interval`` seconds.  This must be called before
+        `softioc.builder.LoadDatabase`.  The records are named with the given
+        ``prefix`` after the current device name, and are:
+
+        ``QUEUED``, ``IN_FLIGHT``, ``COUNT``, ``EXCEPTIONS``
+            Counts of callbacks waiting, dispatched but not complete, complete,
+            and raising an exception.
+        ``WAIT_MEAN``, ``WAIT_MAX``, ``DURATION_MEAN``, ``DURATION_MAX``
+            Times in seconds from dispatch to start and from start to
+            completion.
+        ``WAIT_HIST``, ``DURATION_HIST``
+            The corresponding `Histogram` counts, with bucket limits in
+            ``HIST_LIMITS``.
+        ``BATCHES``, ``LIMITED_BATCHES``, ``MAX_BATCH``
+            Counts of batches run, for dispatchers which run batches.
+        '''
+        from . import builder
+
+        buckets = len(Histogram.LIMITS) + 1
+
+        def counter(name, desc):
+            return builder.longIn(
+                prefix + ':' + name, initial_value=0, DESC=desc)
+
+        def seconds(name, desc):
+            return builder.aIn(
+                prefix + ':' + name, initial_value=0,
+                EGU='s', PREC=6, DESC=desc)
+
+        def histogram(name, desc):
+            return builder.WaveformIn(
+                prefix + ':' + name, length=buckets, datatype=numpy.int32,
+                DESC=desc)
+
+        builder.WaveformIn(
+            prefix + ':HIST_LIMITS', initial_value=list(Histogram.LIMITS),
+            EGU='s', DESC='Histogram bucket upper limits')
+        records = [
+            (counter('QUEUED', 'Callbacks waiting to run'),
+                lambda s: s.queued),
+            (counter('IN_FLIGHT', 'Callbacks not yet complete'),
+                lambda s: s.in_flight),
+            (counter('COUNT', 'Callbacks completed'),
+                lambda s: s.duration.count),
+            (counter('EXCEPTIONS', 'Callbacks raising exceptions'),
+                lambda s: s.exceptions),
+            (seconds('WAIT_MEAN', 'Mean wait to start callback'),
+                lambda s: s.wait.mean),
+            (seconds('WAIT_MAX', 'Longest wait to start callback'),
+                lambda s: s.wait.max),
+            (seconds('DURATION_MEAN', 'Mean callback duration'),
+                lambda s: s.duration.mean),
+            (seconds('DURATION_MAX', 'Longest callback duration'),
+                lambda s: s.duration.max),
+            (histogram('WAIT_HIST', 'Callback wait histogram'),
+                lambda s: list(s.wait.counts)),
+            (histogram('DURATION_HIST', 'Callback duration histogram'),
+                lambda s: list(s.duration.counts)),
+            (counter('BATCHES', 'Callback batches run'),
+                lambda s: self.batches),
+            (counter('LIMITED_BATCHES', 'Batches stopped at limit'),
+                lambda s: self.limited_batches),
+            (counter('MAX_BATCH', 'Largest callback batch'),
+                lambda s: self.max_batch),
+        ]
+
+        def update():
+            while True:
+                with self.__lock:
+                    values = [get(self.total) for _, get in records]
+                for (record, _), value in zip(records, values):
+                    record.set(value)
+                time.sleep(interval)
+
+        threading.Thread(target=update, daemon=True).start()
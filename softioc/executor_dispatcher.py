@@ -0,0 +1,155 @@
+import functools
+import logging
+import queue
+import signal
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy
+
+
+# Stands in for a numpy array argument which has been copied into shared
+# memory for passing to another process.
+_SharedArray = namedtuple('_SharedArray', ['name', 'shape', 'dtype'])
+
+
+def _attach(arg, shared):
+    if isinstance(arg, _SharedArray):
+        from multiprocessing.shared_memory import SharedMemory
+        shm = SharedMemory(name = arg.name)
+        shared.append(shm)
+        arg = numpy.ndarray(arg.shape, arg.dtype, buffer = shm.buf)
+        arg.flags.writeable = False
+    return arg
+
+
+def _call_with_shared_arrays(func, *args):
+    '''Runs in the worker process: attaches to any arrays passed in shared
+    memory and calls func with them in place of their descriptions.'''
+    shared = []
+    call_args = []
+    try:
+        call_args = [_attach(arg, shared) for arg in args]
+        func(*call_args)
+    finally:
+        call_args.clear()
+        for shm in shared:
+            try:
+                shm.close()
+            except BufferError:
+                # The callback kept a reference to the array, so leave the
+                # mapping to be released along with that.
+                pass
+
+
+class ExecutorDispatcher:
+    def __init__(self, executor):
+        """A dispatcher which runs callbacks on a `concurrent.futures.Executor`,
+        suitable to be passed to `softioc.iocInit` or to be given to individual
+        OUT records with the ``on_update_executor`` argument.
+
+        With a `concurrent.futures.ProcessPoolExecutor` callbacks run in other
+        processes, and so are not limited by the GIL.  Callbacks and their
+        arguments must then be picklable, except that numpy arrays are passed
+        to the worker through shared memory rather than being pickled.  These
+        arrays are read-only and only valid for the duration of the callback.
+        """
+        self.__executor = executor
+        self.__use_shared_memory = isinstance(executor, ProcessPoolExecutor)
+
+        # Calls are submitted to the executor from our own thread.  EPICS
+        # threads run with all signals blocked, and any worker processes (or
+        # the multiprocessing fork server) started from one of them would
+        # inherit this, which prevents them from ever being reaped.
+        self.__calls = queue.SimpleQueue()
+        self.__submitter = threading.Thread(
+            target = self.__submit_calls, daemon = True)
+        self.__submitter.start()
+
+    def close(self):
+        if self.__submitter is not None:
+            self.__calls.put(None)
+            self.__submitter.join()
+            self.__submitter = None
+        self.__executor.shutdown(wait=True)
+
+    def wait_for_quit(self):
+        stop_event = threading.Event()
+
+        def signal_handler(signum, frame):
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, signal_handler)
+        signal.signal(signal.SIGTERM, signal_handler)
+
+        stop_event.wait()
+
+    @staticmethod
+    def __share(arg, shared):
+        # Copies numpy arrays into shared memory, returning a description of
+        # the array to pass in its place.
+        if isinstance(arg, numpy.ndarray) and not arg.dtype.hasobject:
+            # Only available from Python 3.8, so only imported when needed
+            from multiprocessing.shared_memory import SharedMemory
+            shm = SharedMemory(create = True, size = max(arg.nbytes, 1))
+            shared.append(shm)
+            numpy.ndarray(arg.shape, arg.dtype, buffer = shm.buf)[...] = arg
+            return _SharedArray(shm.name, arg.shape, arg.dtype.str)
+        else:
+            return arg
+
+    @staticmethod
+    def __done(future, shared, completion, completion_args):
+        try:
+            future.result()
+        except Exception:
+            logging.exception("Exception when running dispatched callback")
+        finally:
+            for shm in shared:
+                shm.close()
+                shm.unlink()
+            if completion:
+                completion(*completion_args)
+
+    def __submit_calls(self):
+        while True:
+            call = self.__calls.get()
+            if call is None:
+                break
+            func, func_args, completion, completion_args, shared = call
+            try:
+                future = self.__executor.submit(func, *func_args)
+            except Exception:
+                logging.exception("Unable to submit dispatched callback")
+                for shm in shared:
+                    shm.close()
+                    shm.unlink()
+                if completion:
+                    completion(*completion_args)
+            else:
+                future.add_done_callback(functools.partial(
+                    self.__done, shared = shared, completion = completion,
+                    completion_args = completion_args))
+
+    def __call__(
+            self,
+            func,
+            func_args=(),
+            completion = None,
+            completion_args=(),
+            record_name = None,
+            priority = None):
+        shared = []
+        if self.__use_shared_memory:
+            func_args = tuple(self.__share(arg, shared) for arg in func_args)
+            if shared:
+                func_args = (func,) + func_args
+                func = _call_with_shared_arrays
+        self.__calls.put((func, func_args, completion, completion_args, shared))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, A, B, C):
+        self.close()
@@ -7,6 +7,7 @@
 #include <dbAccess.h>
 #include <dbFldTypes.h>
 #include <callback.h>
+#include <dbScan.h>
 #include <dbStaticLib.h>
 #include <asTrapWrite.h>
 #include <epicsVersion.h>
@@ -93,29 +94,78 @@ static PyObject *get_field_offsets(PyObject *self, PyObject *args)
 }
 
 
+/* Looking up a field by name with dbNameToAddr involves a hash lookup and
+ * parsing the name, so callers which access the same field repeatedly can
+ * resolve the dbAddr once and hold onto it inside a capsule. */
+#define DBADDR_CAPSULE_NAME "softioc.dbAddr"
+
+static void dbaddr_capsule_destructor(PyObject *obj)
+{
+    free(PyCapsule_GetPointer(obj, DBADDR_CAPSULE_NAME));
+}
+
+
+static PyObject *db_name_to_addr(PyObject *self, PyObject *args)
+{
+    const char *name;
+    if (!PyArg_ParseTuple(args, "s", &name))
+        return NULL;
+
+    struct dbAddr *dbAddr = malloc(sizeof(struct dbAddr));
+    if (!dbAddr)
+        return PyErr_NoMemory();
+    if (dbNameToAddr(name, dbAddr))
+    {
+        free(dbAddr);
+        return PyErr_Format(
+            PyExc_RuntimeError, "dbNameToAddr failed for %s", name);
+    }
+    return PyCapsule_New(dbAddr, DBADDR_CAPSULE_NAME, dbaddr_capsule_destructor);
+}
+
+
+/* Fields can be identified either by name or by a capsule returned from
+ * db_name_to_addr.  Names are resolved into the given dbAddr buffer. */
+static struct dbAddr *get_dbaddr(PyObject *field, struct dbAddr *dbAddr)
+{
+    if (PyCapsule_CheckExact(field))
+        return PyCapsule_GetPointer(field, DBADDR_CAPSULE_NAME);
+
+    const char *name = PyUnicode_AsUTF8(field);
+    if (!name)
+        return NULL;
+    if (dbNameToAddr(name, dbAddr))
+    {
+        PyErr_Format(PyExc_RuntimeError, "dbNameToAddr failed for %s", name);
+        return NULL;
+    }
+    return dbAddr;
+}
+
+
 /* This is our own re-implementation of EPICS's dbPutField function.
  * We do this to allow us to control when dbProcess is called. We use the
  * same logicical flow as the original function. */
 static PyObject *db_put_field_process(PyObject *self, PyObject *args)
 {
-    const char *name;
+    PyObject *field;
     short dbrType;
     PyObject *buffer_ptr;
     long length;
     short process;
-    if (!PyArg_ParseTuple(args, "shOlh",
-            &name, &dbrType, &buffer_ptr, &length, &process))
+    if (!PyArg_ParseTuple(args, "OhOlh",
+            &field, &dbrType, &buffer_ptr, &length, &process))
         return NULL;
     void *pbuffer = PyLong_AsVoidPtr(buffer_ptr);
     if (!pbuffer)
         return NULL;
 
-    struct dbAddr dbAddr;
-    if (dbNameToAddr(name, &dbAddr))
-        return PyErr_Format(
-            PyExc_RuntimeError, "dbNameToAddr failed for %s", name);
+    struct dbAddr buffer;
+    struct dbAddr *dbAddr = get_dbaddr(field, &buffer);
+    if (!dbAddr)
+        return NULL;
 
-    struct dbCommon *precord = dbAddr.precord;
+    struct dbCommon *precord = dbAddr->precord;
 
     long put_result;
     /* There are two important locks to consider at this point: The Global
@@ -130,7 +180,7 @@ static PyObject *db_put_field_process(PyObject *self, PyObject *args)
      * See https://github.com/DiamondLightSource/pythonSoftIOC/issues/119. */
     Py_BEGIN_ALLOW_THREADS
     dbScanLock(precord);
-    put_result = dbPut(&dbAddr, dbrType, pbuffer, length);
+    put_result = dbPut(dbAddr, dbrType, pbuffer, length);
 
     if (put_result == 0 && process)
     {
@@ -144,37 +194,39 @@ static PyObject *db_put_field_process(PyObject *self, PyObject *args)
     Py_END_ALLOW_THREADS
     if (put_result)
         return PyErr_Format(
-            PyExc_RuntimeError, "dbPutField failed for %s", name);
+            PyExc_RuntimeError, "dbPutField failed for %s.%s",
+            precord->name, dbAddr->pfldDes->name);
     else
         Py_RETURN_NONE;
 }
 
 static PyObject *db_get_field(PyObject *self, PyObject *args)
 {
-    const char *name;
+    PyObject *field;
     short dbrType;
     PyObject *buffer_ptr;
     long length;
-    if (!PyArg_ParseTuple(args, "shOl", &name, &dbrType, &buffer_ptr, &length))
+    if (!PyArg_ParseTuple(args, "OhOl", &field, &dbrType, &buffer_ptr, &length))
         return NULL;
     void *pbuffer = PyLong_AsVoidPtr(buffer_ptr);
     if (!pbuffer)
         return NULL;
 
-    struct dbAddr dbAddr;
-    if (dbNameToAddr(name, &dbAddr))
-        return PyErr_Format(
-            PyExc_RuntimeError, "dbNameToAddr failed for %s", name);
+    struct dbAddr buffer;
+    struct dbAddr *dbAddr = get_dbaddr(field, &buffer);
+    if (!dbAddr)
+        return NULL;
 
     long get_result;
     long options = 0;
     /* See reasoning for Python macros in long comment in db_put_field. */
     Py_BEGIN_ALLOW_THREADS
-    get_result = dbGetField(&dbAddr, dbrType, pbuffer, &options, &length, NULL);
+    get_result = dbGetField(dbAddr, dbrType, pbuffer, &options, &length, NULL);
     Py_END_ALLOW_THREADS
     if (get_result)
         return PyErr_Format(
-            PyExc_RuntimeError, "dbGetField failed for %s", name);
+            PyExc_RuntimeError, "dbGetField failed for %s.%s",
+            dbAddr->precord->name, dbAddr->pfldDes->name);
     else
         Py_RETURN_NONE;
 }
@@ -321,6 +373,145 @@ static PyObject *signal_processing_complete(PyObject *self, PyObject *args)
 }
 
 
+/* * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * */
+/* I/O Intr scanning support. */
+
+/* Requests I/O Intr processing for a sequence of IOSCANPVT addresses in one
+ * call, so that updating many records costs a single release of the GIL.
+ * Returns a list of the scanIoRequest results, one for each IOSCANPVT. */
+static PyObject *scan_io_request_many(PyObject *self, PyObject *args)
+{
+    PyObject *sequence;
+    if (!PyArg_ParseTuple(args, "O", &sequence))
+        return NULL;
+    PyObject *fast = PySequence_Fast(sequence, "Expected sequence of IOSCANPVT");
+    if (!fast)
+        return NULL;
+
+    Py_ssize_t count = PySequence_Fast_GET_SIZE(fast);
+    IOSCANPVT *pvts = PyMem_Malloc(count * sizeof(IOSCANPVT));
+    unsigned int *results = PyMem_Malloc(count * sizeof(unsigned int));
+    if (!pvts || !results)
+    {
+        PyMem_Free(pvts);
+        PyMem_Free(results);
+        Py_DECREF(fast);
+        return PyErr_NoMemory();
+    }
+    for (Py_ssize_t i = 0; i < count; i ++)
+    {
+        pvts[i] = PyLong_AsVoidPtr(PySequence_Fast_GET_ITEM(fast, i));
+        if (!pvts[i])
+        {
+            if (!PyErr_Occurred())
+                PyErr_SetString(PyExc_ValueError, "Null IOSCANPVT");
+            PyMem_Free(pvts);
+            PyMem_Free(results);
+            Py_DECREF(fast);
+            return NULL;
+        }
+    }
+    Py_DECREF(fast);
+
+    Py_BEGIN_ALLOW_THREADS
+    for (Py_ssize_t i = 0; i < count; i ++)
+        results[i] = scanIoRequest(pvts[i]);
+    Py_END_ALLOW_THREADS
+
+    PyMem_Free(pvts);
+    PyObject *list = PyList_New(count);
+    for (Py_ssize_t i = 0; list && i < count; i ++)
+    {
+        PyObject *result = PyLong_FromUnsignedLong(results[i]);
+        if (!result)
+            Py_CLEAR(list);
+        else
+            PyList_SET_ITEM(list, i, result);
+    }
+    PyMem_Free(results);
+    return list;
+}
+
+
+/* * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * */
+/* Record processing trampoline. */
+
+/* Record processing is by far the most frequent dset callback, so instead of
+ * going through a ctypes callback we install process_trampoline directly in
+ * the dset.  Each record's DPVT points to one of these bindings, created
+ * during record initialisation, holding the bound Python _process method and
+ * the wrapped record it is called with. */
+struct process_binding
+{
+    PyObject *process;
+    PyObject *record;
+};
+
+
+static long process_trampoline(struct dbCommon *precord)
+{
+    struct process_binding *binding = precord->dpvt;
+    if (!binding)
+    {
+        printf("Record %s called with no binding\n", precord->name);
+        return 1;
+    }
+
+    long status = 1;
+    PyGILState_STATE gstate = PyGILState_Ensure();
+    PyObject *result = PyObject_CallFunctionObjArgs(
+        binding->process, binding->record, NULL);
+    if (result)
+    {
+        status = PyLong_AsLong(result);
+        Py_DECREF(result);
+    }
+    if (PyErr_Occurred())
+    {
+        PyErr_WriteUnraisable(binding->process);
+        status = 1;
+    }
+    PyGILState_Release(gstate);
+    return status;
+}
+
+
+static PyObject *get_process_trampoline(PyObject *self, PyObject *args)
+{
+    return PyLong_FromVoidPtr(process_trampoline);
+}
+
+
+static PyObject *bind_record_process(PyObject *self, PyObject *args)
+{
+    PyObject *record_ptr;
+    PyObject *process;
+    PyObject *record;
+    if (!PyArg_ParseTuple(args, "OOO", &record_ptr, &process, &record))
+        return NULL;
+    struct dbCommon *precord = PyLong_AsVoidPtr(record_ptr);
+    if (!precord)
+    {
+        if (!PyErr_Occurred())
+            PyErr_SetString(PyExc_ValueError, "Null record pointer");
+        return NULL;
+    }
+    if (precord->dpvt)
+        return PyErr_Format(
+            PyExc_RuntimeError, "Record %s already bound", precord->name);
+
+    struct process_binding *binding = malloc(sizeof(struct process_binding));
+    if (!binding)
+        return PyErr_NoMemory();
+    Py_INCREF(process);
+    Py_INCREF(record);
+    binding->process = process;
+    binding->record = record;
+    precord->dpvt = binding;
+    Py_RETURN_NONE;
+}
+
+
 /* * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * * */
 /* Initialisation. */
 
@@ -333,12 +524,20 @@ static struct PyMethodDef softioc_methods[] = {
      "Put a database field to a value"},
     {"db_get_field",  db_get_field, METH_VARARGS,
      "Get a database field's value"},
+    {"db_name_to_addr",  db_name_to_addr, METH_VARARGS,
+     "Resolve a database field name to a reusable dbAddr handle"},
     {"install_pv_logging",  install_pv_logging, METH_VARARGS,
      "Install caput logging to stdout"},
     {"signal_processing_complete",  signal_processing_complete, METH_VARARGS,
      "Inform EPICS that asynchronous record processing has completed"},
     {"create_callback_capsule",  create_callback_capsule, METH_VARARGS,
      "Create a CALLBACK structure inside a PyCapsule"},
+    {"scan_io_request_many",  scan_io_request_many, METH_VARARGS,
+     "Request I/O Intr processing for each IOSCANPVT in a sequence"},
+    {"get_process_trampoline",  get_process_trampoline, METH_VARARGS,
+     "Get the address of the C dset process callback"},
+    {"bind_record_process",  bind_record_process, METH_VARARGS,
+     "Bind a record to the Python method called when it is processed"},
     {NULL, NULL, 0, NULL}        /* Sentinel */
 };
 
@@ -52,89 +52,155 @@ class RecordFactory(object):
         missing = set(fields) - set(self.fields)
         assert not missing, \
             'Fields not supported by %s: %s' % (record_type, sorted(missing))
+        self.__record_class = _record_class(record_type, self.fields)
 
     def __call__(self, record):
         '''Converts a raw pointer to a record structure into a _Record object
         with automatic access to fields configured in the original call to
         the constructor.'''
-        return _Record(self.fields, record)
-
-
-class _Record(object):
-    '''Wraps record together with field definitions.'''
-
-    def __init__(self, fields, record):
-        self.__dict__['fields'] = fields
-        self.__dict__['record'] = c_void_p(record)
-        # This trick allows us to pass the record back to a ctype function.
-        self.__dict__['_as_parameter_'] = record
-
-    def __getattr__(self, field):
-        offset, size, field_type = self.fields[field]
-        address = c_void_p(offset + self.record.value)
-
-        if field == 'TIME':
-            return self.__get_time(address)
+        return self.__record_class.from_address(record)
+
+
+# Cache of generated _Record subclasses, one for each record type.  Several
+# device classes (for example all the waveform variants) share a record type.
+_RecordClasses = {}
+
+def _record_class(record_type, fields):
+    '''Returns the _Record subclass for the given record type, building it on
+    first use.  Each subclass is a ctypes Structure laid out to overlay the
+    EPICS record, so that reading a numeric field is a single attribute access.
+    Fields needing conversion (strings, links and TIME) are stored under a raw
+    name prefixed with _ and are exposed through a property.'''
+    try:
+        return _RecordClasses[record_type]
+    except KeyError:
+        pass
+
+    layout = []
+    namespace = dict(fields = fields)
+    # Names of the fields which can be read and written through the overlay.
+    field_names = set()
+    position = 0
+    for name, (offset, size, field_type) in \
+            sorted(fields.items(), key = lambda field: field[1][0]):
+        if name == 'TIME':
+            ctypes_type = ca_timestamp
+            field_property = property(_get_time, _set_time)
         elif field_type == DBF_STRING:
-            raw_string = string_at(cast(address, c_char_p))
-            return raw_string.decode(errors = 'replace')
+            ctypes_type = c_char * size
+            field_property = _string_property(name, offset, size)
         elif field_type in [DBF_INLINK, DBF_OUTLINK]:
-            raw_string = cast(address, POINTER(c_char_p))[0]
-            return raw_string.decode(errors = 'replace')
-        else:
+            ctypes_type = c_char_p
+            field_property = _string_property(name, offset, 0)
+        elif field_type in DbfCodeToCtypes:
             ctypes_type = DbfCodeToCtypes[field_type]
-            return cast(address, POINTER(ctypes_type))[0]
+            field_property = None
+        else:
+            # Types DEVICE and FWDLINK aren't supported.
+            continue
+
+        if offset < position or sizeof(ctypes_type) > size:
+            # Can't safely overlay this field, so leave it out.
+            continue
+        if offset > position:
+            layout.append(('_pad_' + name, c_char * (offset - position)))
+        if field_property is None:
+            layout.append((name, ctypes_type))
+        else:
+            layout.append(('_' + name, ctypes_type))
+            namespace[name] = field_property
+        field_names.add(name)
+        position = offset + sizeof(ctypes_type)
+
+    if 'VAL' in fields:
+        offset, size, field_type = fields['VAL']
+        namespace['_val_offset_'] = offset
+        namespace['_val_size_'] = size
+        namespace['_val_type_'] = DbfCodeToCtypes.get(field_type)
+
+    # The field offsets come from EPICS, so we pad between fields ourselves
+    # and stop ctypes from applying any alignment of its own.
+    namespace['_pack_'] = 1
+    namespace['_layout_'] = 'ms'
+    namespace['_fields_'] = layout
+    namespace['_field_names_'] = frozenset(field_names)
+    record_class = type('_Record', (_Record,), namespace)
+    _RecordClasses[record_type] = record_class
+    return record_class
+
+
+def _get_time(self):
+    raw = self._TIME
+    return ca_timestamp(raw.secs + EPICS_epoch, raw.nsec)
+
+def _set_time(self, new_time):
+    raw = self._TIME
+    if isinstance(new_time, ca_timestamp):
+        raw.secs = new_time.secs
+        raw.nsec = new_time.nsec
+    else:
+        # Assume the timestamp is a floating point
+        raw.secs = int(new_time)
+        raw.nsec = int(1e9 * (new_time % 1.0))
+    # Fixup the EPICS epoch offset: this never shows outside low level
+    # library access.
+    raw.secs -= EPICS_epoch
+
+def _string_property(name, offset, size):
+    '''Property for string fields and for links, the latter being read only
+    (size 0).'''
+    raw_name = '_' + name
+
+    def getter(self):
+        return getattr(self, raw_name).decode(errors = 'replace')
+
+    def setter(self, value):
+        value = str(value).encode()
+        buffer = create_string_buffer(value)
+        memmove(addressof(self) + offset, buffer, min(size, len(value) + 1))
+
+    return property(getter, setter if size else None)
+
+
+class _Record(Structure):
+    '''Wraps record together with field definitions.  A subclass overlaying
+    the record structure is generated for each record type by RecordFactory.
+    '''
+
+    # This trick allows us to pass the record back to a ctype function.
+    @property
+    def _as_parameter_(self):
+        return addressof(self)
+
+    @property
+    def record(self):
+        return c_void_p(addressof(self))
+
+    # Fields which are not part of the overlay must not be silently stored as
+    # Python attributes instead of reaching the record, so as for a missing
+    # field they raise KeyError.
+    def __getattr__(self, field):
+        if field[:1] == '_':
+            raise AttributeError(field)
+        raise KeyError(field)
 
     def __setattr__(self, field, value):
-        offset, size, field_type = self.fields[field]
-        address = c_void_p(offset + self.record.value)
-
-        if field == 'TIME':
-            self.__set_time(address, value)
-        elif field_type == DBF_STRING:
-            value = str(value).encode()
-            buffer = create_string_buffer(value)
-            if size > len(value) + 1:
-                size = len(value) + 1
-            memmove(address, buffer, size)
-        else:
-            ctypes_type = DbfCodeToCtypes[field_type]
-            cast(address, POINTER(ctypes_type))[0] = value
+        if field not in self._field_names_:
+            raise KeyError(field)
+        super().__setattr__(field, value)
 
     # Directly write EPICS compatible value to .VAL field
     def write_val(self, value):
-        offset, size, field_type = self.fields['VAL']
-        address = c_void_p(offset + self.record.value)
-
-        ctypes_type = DbfCodeToCtypes[field_type]
-        assert sizeof(value) == size, \
-            'Incompatible field and value: %d %d' % (sizeof(value), size)
-        cast(address, POINTER(ctypes_type))[0] = value
+        assert sizeof(value) == self._val_size_, \
+            'Incompatible field and value: %d %d' % (
+                sizeof(value), self._val_size_)
+        memmove(
+            addressof(self) + self._val_offset_, addressof(value),
+            self._val_size_)
 
     def read_val(self):
-        offset, size, field_type = self.fields['VAL']
-        address = c_void_p(offset + self.record.value)
-        ctypes_type = DbfCodeToCtypes[field_type]
-        return cast(address, POINTER(ctypes_type)).contents
-
-
-    def __get_time(self, address):
-        timestamp = cast(address, POINTER(ca_timestamp))[0]
-        timestamp.secs += EPICS_epoch
-        return timestamp
-
-    def __set_time(self, address, new_time):
-        address = cast(address, POINTER(ca_timestamp))
-        if isinstance(new_time, ca_timestamp):
-            address[0] = new_time
-        else:
-            # Assume the timestamp is a floating point
-            address[0].secs = int(new_time)
-            address[0].nsec = int(1e9 * (new_time % 1.0))
-        # Fixup the EPICS epoch offset: this never shows outside low level
-        # library access.
-        address[0].secs -= EPICS_epoch
-
+        return self._val_type_.from_address(
+            addressof(self) + self._val_offset_)
 
 
 __all__ = ['RecordFactory', 'ca_timestamp']
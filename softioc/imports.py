@@ -19,15 +19,21 @@ def get_field_offsets(record_type):
     '''Return {field_name: (offset, size, field_type)}'''
     return _extension.get_field_offsets(record_type)
 
+def db_name_to_addr(name):
+    '''Resolve name to a dbAddr handle, which can be passed in place of the
+    name to db_put_field_process and db_get_field'''
+    return _extension.db_name_to_addr(name)
+
 def db_put_field_process(name, dbr_type, pbuffer, length, process):
     '''Put field where pbuffer is void* pointer, conditionally processing
-    the record. Returns None.'''
+    the record. name is a field name or dbAddr handle. Returns None.'''
     return _extension.db_put_field_process(
         name, dbr_type, pbuffer, length, process
     )
 
 def db_get_field(name, dbr_type, pbuffer, length):
-    '''Get field where pbuffer is void* pointer. Returns None.'''
+    '''Get field where pbuffer is void* pointer. name is a field name or
+    dbAddr handle. Returns None.'''
     return _extension.db_get_field(name, dbr_type, pbuffer, length)
 
 def install_pv_logging(acf_file):
@@ -41,9 +47,24 @@ def signal_processing_complete(record, callback):
     '''Signal that asynchronous record processing has completed'''
     _extension.signal_processing_complete(
         record.PRIO,
-        record.record.value,
+        addressof(record),
         callback)
 
+def scan_io_request_many(ioscanpvts):
+    '''Call scanIoRequest for each IOSCANPVT (given as an integer address) in
+    the sequence, releasing the GIL once for all of them.  Returns the list of
+    scanIoRequest results'''
+    return _extension.scan_io_request_many(ioscanpvts)
+
+def get_process_trampoline():
+    '''Returns the address of the C function used as the dset process entry'''
+    return _extension.get_process_trampoline()
+
+def bind_record_process(record, process):
+    '''Binds record to the callable invoked by the process trampoline, which
+    will be called with record as its only argument'''
+    _extension.bind_record_process(addressof(record), process, record)
+
 def expect_success(status, function, args):
     assert status == 0, 'Expected success'
 
@@ -72,9 +93,10 @@ registryDeviceSupportAdd.errcheck = expect_true
 
 
 # void scanIoInit(IOSCANPVT *)
-# void scanIoRequest(IOSCANPVT *)
+# unsigned int scanIoRequest(IOSCANPVT *)
 #
-# Initialise and trigger I/O Intr processing structure.
+# Initialise and trigger I/O Intr processing structure.  scanIoRequest returns
+# a mask of the priorities for which processing was queued.
 IOSCANPVT = c_void_p
 
 scanIoInit = dbCore.scanIoInit
@@ -83,7 +105,7 @@ scanIoInit.restype = None
 
 scanIoRequest = dbCore.scanIoRequest
 scanIoRequest.argtypes = (IOSCANPVT,)
-scanIoRequest.restype = None
+scanIoRequest.restype = c_uint
 
 dbLoadDatabase = dbCore.dbLoadDatabase
 dbLoadDatabase.argtypes = (auto_encode, auto_encode, auto_encode)
@@ -93,6 +115,24 @@ callbackSetQueueSize = dbCore.callbackSetQueueSize
 callbackSetQueueSize.argtypes = (c_int,)
 callbackSetQueueSize.errcheck = expect_success
 
+# int callbackQueueStatus(const int reset, callbackQueueStats *result)
+#
+# Returns the size of the callback queues, and for each priority the number
+# of entries in use, the most ever in use and the number of overflows.
+class callbackQueueStats(Structure):
+    _fields_ = [
+        ('size', c_int),
+        ('numUsed', c_int * 3),
+        ('maxUsed', c_int * 3),
+        ('numOverflow', c_int * 3)]
+
+callbackQueueStatus = dbCore.callbackQueueStatus
+callbackQueueStatus.argtypes = (c_int, POINTER(callbackQueueStats))
+callbackQueueStatus.errcheck = expect_success
+
+# Set once the IOC is running and records can be processed.
+interruptAccept = c_int.in_dll(dbCore, 'interruptAccept')
+
 # unsigned short recGblResetAlarms(void *precord)
 #
 # Raises event processing if any alarm status has changed, and resets NSTA
@@ -123,5 +163,6 @@ __all__ = [
     'IOSCANPVT', 'scanIoRequest', 'scanIoInit',
     'dbLoadDatabase',
     'callbackSetQueueSize',
+    'callbackQueueStats', 'callbackQueueStatus',
     'recGblResetAlarms',
 ]
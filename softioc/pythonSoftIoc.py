@@ -23,9 +23,11 @@ class RecordWrapper(object):
         # remaining arguments are passed to the builder.  It's a shame we
         # have to maintain this separately from the corresponding device list.
         DeviceKeywords = [
-            'on_update', 'on_update_name', 'validate', 'always_update',
-            'initial_value', '_wf_nelm', '_wf_dtype', 'blocking',
-            'autosave'
+            'on_update', 'on_update_name', 'on_update_executor', 'validate',
+            'always_update', 'coalesce', 'initial_value', '_wf_nelm',
+            '_wf_dtype', 'double_buffer', 'blocking', 'autosave',
+            'scan_group', '_block', '_block_index', 'overflow_policy',
+            'overflow_timeout'
         ]
         device_kargs = {}
         for keyword in DeviceKeywords:
@@ -106,6 +108,11 @@ class PythonDevice(object):
         cls.long_stringout = cls.makeRecord(
             epicsdbbuilder.records.waveform, device.long_stringout,
             'PythonLongStringOut')
+        for name in ['ai', 'longin', 'int64in']:
+            builder = getattr(epicsdbbuilder.records, name)
+            record = getattr(device, name + '_block')
+            setattr(cls, name + '_block', cls.makeRecord(
+                builder, record, 'PythonBlock'))
 
     class makeRecord:
         def __init__(self, builder, record, dtyp = 'Python'):
@@ -2,6 +2,7 @@ import ctypes
 import os
 import sys
 import atexit
+from collections import namedtuple
 from ctypes import *
 from tempfile import NamedTemporaryFile
 
@@ -26,13 +27,19 @@ def iocInit(dispatcher=None, enable_pva=True):
     After this point the EPICS IOC is running and serving PVs.
 
     Args:
-        dispatcher: A callable with signature ``dispatcher(func, *args)``. Will
-            be called in response to caput on a record. If not supplied uses
-            ``cothread`` as the dispatcher.
+        dispatcher: A callable with signature ``dispatcher(func, func_args=(),
+            completion=None, completion_args=())``. Will be called in response
+            to caput on a record. If it also accepts ``record_name`` and
+            ``priority`` keyword arguments these are passed the name and
+            ``PRIO`` of the record. If not supplied uses ``cothread`` as the
+            dispatcher.
         enable_pva: Specify whether to enable the PV Access Server in this IOC.
 
     See Also:
+        `softioc.cothread_dispatcher` can run callbacks in batches
         `softioc.asyncio_dispatcher` is a dispatcher for `asyncio` applications
+        `softioc.thread_pool_dispatcher` runs callbacks on a pool of threads
+        `softioc.executor_dispatcher` runs callbacks on any executor
     '''
     if dispatcher is None:
         # Fallback to cothread
@@ -235,6 +242,13 @@ scanpiol()
 
 Prints all records in the I/O event scan lists.''')
 
+ExportTest('callbackQueueShow', (c_int,), (0,), '''\
+callbackQueueShow(reset=0)
+
+Prints the size of the callback queues, and for each priority the number of
+entries in use, the maximum in use and the number of overflows.  If reset is
+non-zero then the maximum and overflow counts are then reset.''')
+
 
 ExportTest('casr', (c_int,), (0,), '''\
 casr(level=0)
@@ -343,6 +357,26 @@ def devIocStats(ioc_name):
     _add_records_from_file(iocstats_dir, 'ioc.template', substitutions)
 
 
+CallbackQueueStatus = namedtuple(
+    'CallbackQueueStatus', ['size', 'used', 'max_used', 'overflows'])
+
+def callbackQueueStatus(reset=False):
+    '''Returns the state of the EPICS callback queues, which are used to
+    process I/O Intr records, as a `CallbackQueueStatus` tuple.  ``size`` is
+    the size of each queue, and ``used``, ``max_used`` and ``overflows`` are
+    tuples of the (LOW, MEDIUM, HIGH) priority queue entries in use, the high
+    water mark of entries in use and the number of requests rejected because
+    the queue was full.  If ``reset`` is True then the high water marks and
+    overflow counts are reset after being read.  This can only be called
+    after `iocInit`.'''
+    status = imports.callbackQueueStats()
+    imports.callbackQueueStatus(int(reset), byref(status))
+    return CallbackQueueStatus(
+        status.size,
+        tuple(status.numUsed), tuple(status.maxUsed),
+        tuple(status.numOverflow))
+
+
 def interactive_ioc(context = {}, call_exit = True):
     '''Fires up the interactive IOC prompt with the given context.
 
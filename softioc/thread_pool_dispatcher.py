@@ -0,0 +1,112 @@
+import collections
+import functools
+import inspect
+import logging
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .callback_queue import CallbackQueue
+
+class ThreadPoolDispatcher:
+    def __init__(self, max_workers=None, per_record_ordering=True):
+        """A dispatcher which runs callbacks on a pool of threads, suitable to
+        be passed to `softioc.iocInit`.  This allows slow or blocking
+        `on_update` callbacks for one record to run without holding up the
+        callbacks for other records.
+
+        ``max_workers`` is passed through to
+        `concurrent.futures.ThreadPoolExecutor`.
+
+        If ``per_record_ordering`` is True then callbacks for the same record
+        are run one at a time in the order they were dispatched, while
+        callbacks for different records run in parallel.  Callbacks are
+        matched by their completion, or by the function called if there is no
+        completion.  Otherwise callbacks are simply run in any order.
+
+        When all the threads are busy, waiting callbacks are started in order
+        of record priority (the ``PRIO`` field).
+        """
+        self.__executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix='softioc-dispatcher')
+        self.__per_record_ordering = per_record_ordering
+        # Callbacks waiting for an earlier callback for the same record to
+        # finish, indexed by record.  A record is present while any of its
+        # callbacks is running.
+        self.__queues = {}
+        self.__lock = threading.Lock()
+        # Callbacks ready to run, in priority order.
+        self.__ready = CallbackQueue()
+
+    def close(self):
+        self.__executor.shutdown(wait=True)
+
+    def wait_for_quit(self):
+        stop_event = threading.Event()
+
+        def signal_handler(signum, frame):
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, signal_handler)
+        signal.signal(signal.SIGTERM, signal_handler)
+
+        stop_event.wait()
+
+    @staticmethod
+    def __run(func, func_args, completion, completion_args):
+        try:
+            func(*func_args)
+        except Exception:
+            logging.exception("Exception when running dispatched callback")
+        finally:
+            if completion:
+                completion(*completion_args)
+
+    def __run_queue(self, key, call):
+        # Runs the given call and then any calls for the same record which
+        # were queued while it ran.
+        while True:
+            self.__run(*call)
+            with self.__lock:
+                queue = self.__queues[key]
+                if not queue:
+                    del self.__queues[key]
+                    return
+                call = queue.popleft()
+
+    def __run_next(self):
+        # Each callback made ready submits one call to this, which runs the
+        # highest priority callback waiting.
+        self.__ready.get()()
+
+    def __call__(
+            self,
+            func,
+            func_args=(),
+            completion = None,
+            completion_args=(),
+            record_name = None,
+            priority = None):
+        assert not inspect.iscoroutinefunction(func)
+        assert not inspect.iscoroutinefunction(completion)
+
+        call = (func, func_args, completion, completion_args)
+        if self.__per_record_ordering:
+            key = func if completion is None else completion
+            with self.__lock:
+                queue = self.__queues.get(key)
+                if queue is not None:
+                    queue.append(call)
+                    return
+                self.__queues[key] = collections.deque()
+            self.__ready.put(
+                functools.partial(self.__run_queue, key, call), priority)
+        else:
+            self.__ready.put(functools.partial(self.__run, *call), priority)
+        self.__executor.submit(self.__run_next)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, A, B, C):
+        self.close()
@@ -140,6 +140,77 @@ def test_asyncio_dispatcher_event_loop():
     with pytest.raises(ValueError):
         AsyncioDispatcher(loop=event_loop)
 
+def test_asyncio_dispatcher_batched():
+    """Test that a batched dispatcher runs sync and async callbacks and
+    signals completion for each of them"""
+    import threading
+    results = []
+    completed = []
+    done = threading.Event()
+
+    async def async_callback(value):
+        await asyncio.sleep(0)
+        results.append(value)
+
+    def failing_callback(value):
+        raise ValueError(value)
+
+    def complete(value):
+        completed.append(value)
+        if len(completed) == 4:
+            done.set()
+
+    with AsyncioDispatcher(batched=True) as dispatcher:
+        dispatcher(results.append, (1,), complete, (1,))
+        dispatcher(async_callback, (2,), complete, (2,))
+        dispatcher(failing_callback, (3,), complete, (3,))
+        dispatcher(results.append, (4,), complete, (4,))
+        assert done.wait(TIMEOUT)
+
+    # Sync callbacks run in order, the coroutine completes as a separate task.
+    assert sorted(results) == [1, 2, 4]
+    assert results.index(1) < results.index(4)
+    assert sorted(completed) == [1, 2, 3, 4]
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_asyncio_dispatcher_priority(batched):
+    """Test that callbacks waiting to run are started in priority order"""
+    import threading
+    from softioc.callback_queue import LOW, MEDIUM, HIGH
+    results = []
+    release = threading.Event()
+    done = threading.Event()
+
+    with AsyncioDispatcher(batched=batched) as dispatcher:
+        # Hold up the loop while the other callbacks are dispatched
+        dispatcher(release.wait, (TIMEOUT,))
+        for value, priority in [(1, LOW), (2, HIGH), (3, MEDIUM), (4, HIGH)]:
+            dispatcher(results.append, (value,), priority=priority)
+        dispatcher(done.set, priority=LOW)
+        release.set()
+        assert done.wait(TIMEOUT)
+
+    assert results == [2, 4, 3, 1]
+
+def test_asyncio_dispatcher_loop_factory():
+    """Test that the dispatcher runs on a loop made by the loop factory"""
+    import threading
+    from softioc.asyncio_dispatcher import uvloop_loop_factory
+    loops = []
+    done = threading.Event()
+
+    def loop_factory():
+        loops.append(uvloop_loop_factory())
+        return loops[-1]
+
+    with AsyncioDispatcher(loop_factory=loop_factory) as dispatcher:
+        assert dispatcher.loop is loops[0]
+        dispatcher(done.set)
+        assert done.wait(TIMEOUT)
+
+    assert loops[0].is_closed()
+
+
 def asyncio_dispatcher_test_func(device_name, child_conn):
 
     log("CHILD: Child started")
@@ -18,7 +18,12 @@ def reset_autosave_setup_teardown():
     default_directory = autosave.AutosaveConfig.directory
     default_enabled = autosave.AutosaveConfig.enabled
     default_tb = autosave.AutosaveConfig.timestamped_backups
+    default_format = autosave.AutosaveConfig.format
+    default_journal = autosave.AutosaveConfig.journal
+    default_compact_period = autosave.AutosaveConfig.compact_period
     default_pvs = autosave.Autosave._pvs.copy()
+    default_polled = autosave.Autosave._polled.copy()
+    default_dirty = autosave.Autosave._dirty.copy()
     default_state = autosave.Autosave._last_saved_state.copy()
     default_cm_save_fields = autosave._AutosaveContext._fields
     default_instance = autosave._AutosaveContext._instance
@@ -28,7 +33,17 @@ def reset_autosave_setup_teardown():
     autosave.AutosaveConfig.directory = default_directory
     autosave.AutosaveConfig.enabled = default_enabled
     autosave.AutosaveConfig.timestamped_backups = default_tb
+    autosave.AutosaveConfig.format = default_format
+    autosave.AutosaveConfig.journal = default_journal
+    autosave.AutosaveConfig.compact_period = default_compact_period
+    autosave.Autosave._last_compacted = None
+    autosave.Autosave._generation = None
+    autosave.Autosave._saved_state = None
+    autosave.Autosave._restored = set()
+    autosave.Autosave._load_times = {"read": 0.0, "restore": 0.0, "set": 0.0}
     autosave.Autosave._pvs = default_pvs
+    autosave.Autosave._polled = default_polled
+    autosave.Autosave._dirty = default_dirty
     autosave.Autosave._last_saved_state = default_state
     autosave.Autosave._stop_event = threading.Event()
     autosave._AutosaveContext._fields = default_cm_save_fields
@@ -240,8 +255,210 @@ def test_context_manager(tmp_path):
         assert "AUTOMATIC-EXTRA-FIELD.PINI" in saved
 
 
+def test_save_reads_only_changed_fields(tmp_path):
+    autosave.configure(tmp_path, DEVICE_NAME)
+    changed = builder.aOut("CHANGED", autosave=True)
+    unchanged = builder.aIn("UNCHANGED", 5, autosave=True)
+    builder.aOut("FIELD", autosave="EGU")
+    with patch(
+        "softioc.device.ProcessDeviceSupportCore.get_field", return_value="mm"
+    ):
+        autosave.Autosave._save()
+        saved_time = autosave.Autosave._last_saved_time
+
+        # Fields other than VAL are always read, the VAL of a record only
+        # when it has been set
+        reads = []
+        for name, pv in autosave.Autosave._pvs.items():
+            pv.get = lambda get=pv.get, name=name: reads.append(name) or get()
+        autosave.Autosave._save()
+        assert reads == ["FIELD.EGU"]
+        assert autosave.Autosave._last_saved_time == saved_time
+
+        reads.clear()
+        changed.set(3.0)
+        unchanged.set(5)
+        autosave.Autosave._save()
+        assert sorted(reads) == ["CHANGED", "FIELD.EGU", "UNCHANGED"]
+
+    with open(tmp_path / f"{DEVICE_NAME}.softsav", "r") as f:
+        saved = yaml.full_load(f)
+    assert saved == {"CHANGED": 3.0, "UNCHANGED": 5.0, "FIELD.EGU": "mm"}
+
+
+def test_save_record_block_updated_in_place(tmp_path):
+    autosave.configure(tmp_path, DEVICE_NAME)
+    block = builder.aInBlock("BLOCK:", ["A", "B"], autosave=True)
+    autosave.Autosave._save()
+
+    block.values[1] = 2.5
+    block.trigger()
+    autosave.Autosave._save()
+    with open(tmp_path / f"{DEVICE_NAME}.softsav", "r") as f:
+        saved = yaml.full_load(f)
+    assert saved == {"BLOCK:A": 0.0, "BLOCK:B": 2.5}
+
+
+def test_record_block_without_autosave(tmp_path):
+    autosave.configure(tmp_path, DEVICE_NAME)
+    saved = builder.aInBlock("SAVED:", ["A", "B"], autosave=True)
+    unsaved = builder.aInBlock("UNSAVED:", ["A", "B"])
+    assert saved._autosaved == ["SAVED:A", "SAVED:B"]
+    assert unsaved._autosaved == []
+
+    autosave.Autosave._dirty.clear()
+    unsaved.trigger()
+    assert autosave.Autosave._dirty == set()
+
+
+def test_configure_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        autosave.configure(tmp_path, DEVICE_NAME, format="json")
+
+
+def test_npz_format(tmp_path):
+    autosave.configure(
+        tmp_path, DEVICE_NAME, timestamped_backups=False, format="npz"
+    )
+    waveform = builder.WaveformOut(
+        "WAVEFORM", numpy.arange(1000, dtype=numpy.float64), autosave=True
+    )
+    builder.WaveformOut("STRINGS", ["a", "b"], autosave=True)
+    scalar = builder.aOut("SCALAR", autosave=True)
+    autosave.Autosave._save()
+
+    sav_path = tmp_path / f"{DEVICE_NAME}.softsav"
+    arrays_path = tmp_path / f"{DEVICE_NAME}.softsav.npz"
+    with open(sav_path, "r") as f:
+        saved = yaml.full_load(f)
+    assert saved == {"STRINGS": ["a", "b"], "SCALAR": 0.0}
+    with numpy.load(arrays_path) as arrays:
+        assert arrays.files == ["WAVEFORM"]
+        assert (arrays["WAVEFORM"] == numpy.arange(1000)).all()
+
+    # The arrays file is only rewritten when an array changes
+    arrays_inode = arrays_path.stat().st_ino
+    scalar.set(2.0)
+    autosave.Autosave._save()
+    assert arrays_path.stat().st_ino == arrays_inode
+    waveform.set([1.0, 2.0])
+    autosave.Autosave._save()
+    assert arrays_path.stat().st_ino != arrays_inode
+
+    state = autosave._read_state(sav_path)
+    assert state.keys() == {"WAVEFORM", "STRINGS", "SCALAR"}
+    assert state["SCALAR"] == 2.0
+    assert (state["WAVEFORM"] == [1.0, 2.0]).all()
+
+    # The arrays file is backed up with the YAML file when it is next read
+    autosave.Autosave._saved_state = None
+    autosave.load_autosave()
+    assert (tmp_path / f"{DEVICE_NAME}.softsav.bu.npz").is_file()
+
+
+def test_frozen_arrays_not_copied(tmp_path):
+    autosave.configure(tmp_path, DEVICE_NAME)
+    frozen = builder.WaveformIn("FROZEN", [1, 2, 3], autosave=True)
+    out = builder.WaveformOut("OUT", [1, 2, 3], autosave=True)
+    autosave.Autosave._save()
+    # Frozen waveform values are saved without taking a copy
+    saved = autosave.Autosave._last_saved_state
+    assert saved["FROZEN"] is frozen.get()
+    assert saved["OUT"] is out.get()
+
+
+def test_journal(tmp_path):
+    autosave.configure(tmp_path, DEVICE_NAME, journal=True)
+    pv_a = builder.aOut("A", autosave=True)
+    pv_b = builder.aOut("B", autosave=True)
+    sav_path = tmp_path / f"{DEVICE_NAME}.softsav"
+    journal_path = tmp_path / f"{DEVICE_NAME}.softsav.journal"
+
+    # The first save writes the whole file
+    autosave.Autosave._save()
+    assert not journal_path.exists()
+
+    # Later changes are appended to the journal, after the generation of the
+    # file it applies to
+    pv_a.set(1.0)
+    autosave.Autosave._save()
+    pv_a.set(2.0)
+    pv_b.set(3.0)
+    autosave.Autosave._save()
+    with open(sav_path, "r") as f:
+        saved = yaml.full_load(f)
+    generation = saved.pop("__journal_generation__")
+    assert saved == {"A": 0.0, "B": 0.0}
+    with open(journal_path, "r") as f:
+        assert list(yaml.full_load_all(f)) == [
+            {"__journal_generation__": generation},
+            {"A": 1.0},
+            {"A": 2.0, "B": 3.0},
+        ]
+    assert autosave._read_state(sav_path) == {"A": 2.0, "B": 3.0}
+
+    # Compaction rewrites the whole file and clears the journal
+    autosave.AutosaveConfig.compact_period = 0
+    pv_b.set(4.0)
+    autosave.Autosave._save()
+    assert not journal_path.exists()
+    assert autosave._read_state(sav_path) == {"A": 2.0, "B": 4.0}
+
+
+@pytest.mark.parametrize("torn", ["---\nA: 12", "---\nA:\n", "---\nA: [1,"])
+def test_journal_incomplete_entry_ignored(tmp_path, torn):
+    autosave.configure(tmp_path, DEVICE_NAME, journal=True)
+    pv_a = builder.aOut("A", autosave=True)
+    autosave.Autosave._save()
+    pv_a.set(1.0)
+    autosave.Autosave._save()
+
+    # An entry cut short by an interrupted write is ignored, even if it parses
+    with open(tmp_path / f"{DEVICE_NAME}.softsav.journal", "a") as f:
+        f.write(torn)
+    sav_path = tmp_path / f"{DEVICE_NAME}.softsav"
+    assert autosave._read_state(sav_path) == {"A": 1.0}
+
+
+def test_stale_journal_ignored(tmp_path):
+    autosave.configure(tmp_path, DEVICE_NAME, journal=True)
+    pv_a = builder.aOut("A", autosave=True)
+    autosave.Autosave._save()
+    pv_a.set(1.0)
+    autosave.Autosave._save()
+    journal_path = tmp_path / f"{DEVICE_NAME}.softsav.journal"
+    journal = journal_path.read_text()
+
+    # As if compaction was interrupted before the journal was removed
+    autosave.AutosaveConfig.compact_period = 0
+    pv_a.set(2.0)
+    autosave.Autosave._save()
+    journal_path.write_text(journal)
+    sav_path = tmp_path / f"{DEVICE_NAME}.softsav"
+    assert autosave._read_state(sav_path) == {"A": 2.0}
+
+
+def test_restore_during_construction(existing_autosave_dir):
+    before = builder.aOut("SAVED-AO", autosave=True)
+    autosave.configure(existing_autosave_dir, DEVICE_NAME)
+    after = builder.longIn("SAVED-LONGIN", autosave=True)
+    not_saved = builder.longOut("SAVED-LONGOUT")
+    # Only PVs created after configure() are restored when created
+    assert before.get() == 0.0
+    assert after.get() == 20
+    assert not_saved.get() == 0
+    assert autosave.Autosave._restored == {"SAVED-LONGIN"}
+
+    autosave.load_autosave()
+    assert before.get() == 20.0
+    assert after.get() == 20
+    assert autosave.Autosave._last_saved_state == {
+        "SAVED-AO": 20.0, "SAVED-LONGIN": 20}
+    assert autosave.Autosave._load_times["read"] > 0
+
+
 def check_all_record_types_load_properly(device_name, autosave_dir, conn):
-    autosave.configure(autosave_dir, device_name)
+    # records created before configure() are restored by LoadDatabase()
     pv_aOut = builder.aOut("SAVED-AO", autosave=True)
     pv_aIn = builder.aIn("SAVED-AI", autosave=True)
     pv_boolOut = builder.boolOut("SAVED-BO", autosave=True)
@@ -294,6 +511,7 @@ def check_all_record_types_load_properly(device_name, autosave_dir, conn):
     assert (pv_WaveformOut.get() == numpy.array([0, 0, 0, 0])).all()
     assert pv_WaveformIn_strings.get() == ["initial", "waveform", "strings"]
     assert pv_WaveformOut_strings.get() == ["initial", "waveform", "strings"]
+    autosave.configure(autosave_dir, device_name)
     # load called automatically when LoadDatabase() called
     builder.LoadDatabase()
     assert pv_aOut.get() == 20.0
@@ -318,11 +536,86 @@ def check_all_record_types_load_properly(device_name, autosave_dir, conn):
     conn.send("D")  # "Done"
 
 
-def test_actual_ioc_load(existing_autosave_dir):
+def check_all_record_types_restored_when_created(
+    device_name, autosave_dir, conn
+):
+    autosave.configure(autosave_dir, device_name)
+    # records created after configure() have their saved values as soon as
+    # they are created
+    pv_aOut = builder.aOut("SAVED-AO", autosave=True)
+    assert pv_aOut.get() == 20.0
+    pv_aIn = builder.aIn("SAVED-AI", autosave=True)
+    assert pv_aIn.get() == 20.0
+    pv_boolOut = builder.boolOut("SAVED-BO", autosave=True)
+    assert pv_boolOut.get() == 1
+    pv_boolIn = builder.boolIn("SAVED-BI", autosave=True)
+    assert pv_boolIn.get() == 1
+    pv_longIn = builder.longIn("SAVED-LONGIN", autosave=True)
+    assert pv_longIn.get() == 20
+    pv_longOut = builder.longOut("SAVED-LONGOUT", autosave=True)
+    assert pv_longOut.get() == 20
+    pv_int64In = builder.int64In("SAVED-INT64IN", autosave=True)
+    assert pv_int64In.get() == 100
+    pv_int64Out = builder.int64Out("SAVED-INT64OUT", autosave=True)
+    assert pv_int64Out.get() == 100
+    pv_mbbIn = builder.mbbIn("SAVED-MBBI", autosave=True)
+    assert pv_mbbIn.get() == 15
+    pv_mbbOut = builder.mbbOut("SAVED-MBBO", autosave=True)
+    assert pv_mbbOut.get() == 15
+    pv_stringIn = builder.stringIn("SAVED-STRINGIN", autosave=True)
+    assert pv_stringIn.get() == "test string in"
+    pv_stringOut = builder.stringOut("SAVED-STRINGOUT", autosave=True)
+    assert pv_stringOut.get() == "test string out"
+    pv_longStringIn = builder.longStringIn("SAVED-LONGSTRINGIN", autosave=True)
+    assert pv_longStringIn.get() == "test long string in"
+    pv_longStringOut = builder.longStringOut(
+        "SAVED-LONGSTRINGOUT", autosave=True
+    )
+    assert pv_longStringOut.get() == "test long string out"
+    pv_Action = builder.Action("SAVED-ACTION", autosave=True)
+    assert pv_Action.get() == 1
+    pv_WaveformIn = builder.WaveformIn(
+        "SAVED-WAVEFORMIN", numpy.zeros((4)), autosave=True
+    )
+    assert (pv_WaveformIn.get() == numpy.array([1, 2, 3, 4])).all()
+    pv_WaveformOut = builder.WaveformOut(
+        "SAVED-WAVEFORMOUT", numpy.zeros((4)), autosave=True
+    )
+    assert (pv_WaveformOut.get() == numpy.array([1, 2, 3, 4])).all()
+    pv_WaveformIn_strings = builder.WaveformIn(
+        "SAVED-WAVEFORMIN-STRINGS",
+        ["initial", "waveform", "strings"],
+        autosave=True,
+    )
+    assert pv_WaveformIn_strings.get() == ["test", "waveform", "strings"]
+    pv_WaveformOut_strings = builder.WaveformOut(
+        "SAVED-WAVEFORMOUT-STRINGS",
+        ["initial", "waveform", "strings"],
+        autosave=True,
+    )
+    assert pv_WaveformOut_strings.get() == ["test", "waveform", "strings"]
+    assert len(autosave.Autosave._restored) == 19
+    # nothing is left for LoadDatabase() to change
+    builder.LoadDatabase()
+    assert pv_aOut.get() == 20.0
+    assert pv_longIn.get() == 20
+    assert (pv_WaveformOut.get() == numpy.array([1, 2, 3, 4])).all()
+    assert pv_WaveformOut_strings.get() == ["test", "waveform", "strings"]
+    conn.send("D")  # "Done"
+
+
+@pytest.mark.parametrize(
+    "check_func",
+    [
+        check_all_record_types_load_properly,
+        check_all_record_types_restored_when_created,
+    ],
+)
+def test_actual_ioc_load(existing_autosave_dir, check_func):
     ctx = get_multiprocessing_context()
     parent_conn, child_conn = ctx.Pipe()
     ioc_process = ctx.Process(
-        target=check_all_record_types_load_properly,
+        target=check_func,
         args=(DEVICE_NAME, existing_autosave_dir, child_conn),
     )
     ioc_process.start()
@@ -62,3 +62,66 @@ def test_cothread_ioc(cothread_ioc):
         print("Out:", out)
         print("Err:", err)
         raise
+
+
+@requires_cothread
+def test_cothread_dispatcher_priority():
+    """Test that the cothread dispatcher runs callbacks in priority order"""
+    import cothread
+    from softioc.callback_queue import LOW, MEDIUM, HIGH
+    from softioc.cothread_dispatcher import CothreadDispatcher
+
+    dispatcher = CothreadDispatcher()
+    results = []
+    for value, priority in [
+            (1, LOW), (2, HIGH), (3, MEDIUM), (4, HIGH), (5, None)]:
+        dispatcher(results.append, (value,), priority=priority)
+
+    cothread.Sleep(0.1)
+    assert results == [2, 4, 3, 1, 5]
+
+
+@requires_cothread
+def test_cothread_dispatcher_batches():
+    """Test that a batched cothread dispatcher yields to other cothreads
+    between batches"""
+    import cothread
+    from softioc.cothread_dispatcher import CothreadDispatcher
+
+    dispatcher = CothreadDispatcher(batch_size=5)
+    results = []
+    seen = []
+
+    def poller():
+        # Records how many callbacks had run each time this gets to run
+        while len(results) < 20:
+            seen.append(len(results))
+            cothread.Yield()
+
+    for value in range(20):
+        dispatcher(results.append, (value,))
+    cothread.Spawn(poller)
+
+    cothread.Sleep(0.1)
+    assert results == list(range(20))
+    assert any(0 < n < 20 for n in seen)
+    assert dispatcher.stats.batches == 4
+    assert dispatcher.stats.limited_batches == 3
+    assert dispatcher.stats.max_batch == 5
+
+
+@requires_cothread
+def test_cothread_dispatcher_batch_time():
+    """Test that a batch stops once its time limit has passed"""
+    import time
+    import cothread
+    from softioc.cothread_dispatcher import CothreadDispatcher
+
+    dispatcher = CothreadDispatcher(batch_time=0.015)
+    for _ in range(6):
+        dispatcher(time.sleep, (0.01,))
+
+    cothread.Sleep(0.2)
+    assert dispatcher.stats.total.duration.count == 6
+    assert dispatcher.stats.batches == 3
+    assert dispatcher.stats.max_batch == 2
@@ -0,0 +1,167 @@
+import pytest
+import threading
+
+from conftest import (
+    create_random_prefix,
+    get_multiprocessing_context,
+    log,
+    requires_cothread,
+    select_and_recv,
+    TIMEOUT,
+)
+
+from softioc import builder, softioc
+from softioc.asyncio_dispatcher import AsyncioDispatcher
+from softioc.dispatcher_stats import DispatcherStats, Histogram
+
+
+def test_histogram():
+    """Test that durations are counted in the right buckets"""
+    histogram = Histogram()
+    for duration in [5e-6, 1e-5, 2e-5, 0.5, 100]:
+        histogram.add(duration)
+
+    assert histogram.counts == [2, 1, 0, 0, 0, 1, 0, 1]
+    assert histogram.count == 5
+    assert histogram.max == 100
+    assert histogram.mean == pytest.approx(sum(
+        [5e-6, 1e-5, 2e-5, 0.5, 100]) / 5)
+
+
+def test_stats_in_flight():
+    """Test that callbacks are counted as queued and in flight until they
+    have started and finished"""
+    stats = DispatcherStats()
+    token = stats.dispatched("REC")
+    assert stats.total.queued == 1
+    assert stats.records["REC"].in_flight == 1
+
+    token = stats.started(token)
+    assert stats.total.queued == 0
+    assert stats.total.in_flight == 1
+    assert stats.total.wait.count == 1
+
+    stats.finished(token, failed=True)
+    assert stats.total.in_flight == 0
+    assert stats.records["REC"].exceptions == 1
+    assert stats.records["REC"].duration.count == 1
+
+
+@pytest.mark.parametrize("batched", [False, True])
+def test_asyncio_dispatcher_stats(batched):
+    """Test that the asyncio dispatcher records statistics per record and
+    overall"""
+    done = threading.Event()
+
+    async def async_callback():
+        pass
+
+    def failing_callback():
+        raise ValueError()
+
+    with AsyncioDispatcher(batched=batched) as dispatcher:
+        dispatcher(print, record_name="A")
+        dispatcher(async_callback, record_name="A")
+        dispatcher(failing_callback, record_name="B")
+        dispatcher(print, completion=done.set)
+        assert done.wait(TIMEOUT)
+
+    stats = dispatcher.stats
+    assert stats.total.duration.count == 4
+    assert stats.total.exceptions == 1
+    assert stats.total.in_flight == 0
+    assert stats.records["A"].wait.count == 2
+    assert stats.records["A"].exceptions == 0
+    assert stats.records["B"].exceptions == 1
+    assert sorted(stats.records) == ["A", "B"]
+
+
+def test_asyncio_empty_batch_not_counted():
+    """Test that a batch which finds no callbacks waiting is not counted"""
+    done = threading.Event()
+    with AsyncioDispatcher(batched=True) as dispatcher:
+        # As if a second batch had been scheduled by racing callers
+        dispatcher.loop.call_soon_threadsafe(
+            dispatcher._AsyncioDispatcher__run_batch)
+        dispatcher(print, completion=done.set)
+        assert done.wait(TIMEOUT)
+
+    assert dispatcher.stats.batches == 1
+    assert dispatcher.stats.max_batch == 1
+
+
+def stats_records_test_func(device_name, conn):
+    import cothread
+    from softioc.cothread_dispatcher import CothreadDispatcher
+
+    builder.SetDeviceName(device_name)
+
+    def on_update(value):
+        if value < 0:
+            raise ValueError(value)
+
+    builder.aOut("AO", on_update=on_update, blocking=True)
+
+    dispatcher = CothreadDispatcher()
+    dispatcher.stats.create_records(interval=0.1)
+
+    builder.LoadDatabase()
+    softioc.iocInit(dispatcher)
+
+    conn.send("R")  # "Ready"
+    log("CHILD: Sent R over Connection to Parent")
+
+    # Keep process alive while main thread works.
+    while not conn.poll():
+        cothread.Sleep(0.1)
+    val = conn.recv()
+    assert val == "D", "Did not receive expected Done character"
+
+
+@requires_cothread
+def test_cothread_dispatcher_stats_records():
+    """Test that the cothread dispatcher statistics are published as PVs"""
+    ctx = get_multiprocessing_context()
+    parent_conn, child_conn = ctx.Pipe()
+
+    device_name = create_random_prefix()
+
+    process = ctx.Process(
+        target=stats_records_test_func,
+        args=(device_name, child_conn),
+    )
+
+    process.start()
+
+    from cothread import Sleep
+    from cothread.catools import caget, caput, _channel_cache
+
+    try:
+        # Wait for message that IOC has started
+        select_and_recv(parent_conn, "R")
+
+        # Suppress potential spurious warnings
+        _channel_cache.purge()
+
+        for value in [1, 2, -1]:
+            caput(device_name + ":AO", value, wait=True, timeout=TIMEOUT)
+
+        # Wait for the statistics records to be updated
+        Sleep(0.5)
+
+        prefix = device_name + ":DISPATCHER:"
+        assert caget(prefix + "COUNT", timeout=TIMEOUT) == 3
+        assert caget(prefix + "EXCEPTIONS", timeout=TIMEOUT) == 1
+        assert caget(prefix + "IN_FLIGHT", timeout=TIMEOUT) == 0
+        assert sum(caget(prefix + "DURATION_HIST", timeout=TIMEOUT)) == 3
+        assert len(caget(prefix + "HIST_LIMITS", timeout=TIMEOUT)) == \
+            len(Histogram.LIMITS)
+
+    finally:
+        # Suppress potential spurious warnings
+        _channel_cache.purge()
+        parent_conn.send("D")  # "Done"
+        process.join(timeout=TIMEOUT)
+        if process.exitcode is None:
+            process.terminate()
+            pytest.fail("Process did not terminate")
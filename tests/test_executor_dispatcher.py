@@ -0,0 +1,162 @@
+import numpy
+import pytest
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+from conftest import (
+    create_random_prefix,
+    get_multiprocessing_context,
+    log,
+    requires_cothread,
+    select_and_recv,
+    TIMEOUT,
+)
+
+from softioc import builder, softioc
+from softioc.executor_dispatcher import ExecutorDispatcher
+
+
+# Callbacks run in a process pool must be importable by the worker processes.
+
+def save_value(path, value):
+    numpy.save(path, value)
+    with open(path + ".writeable", "w") as f:
+        f.write(str(getattr(value, "flags", None) and value.flags.writeable))
+
+def raise_error(value):
+    raise ValueError(value)
+
+
+def run_callbacks(executor, calls):
+    """Dispatches each (func, args) call and waits for their completions"""
+    completed = []
+    done = threading.Event()
+
+    def complete(n):
+        completed.append(n)
+        if len(completed) == len(calls):
+            done.set()
+
+    with ExecutorDispatcher(executor) as dispatcher:
+        for n, (func, args) in enumerate(calls):
+            dispatcher(func, args, complete, (n,))
+        assert done.wait(TIMEOUT)
+    return sorted(completed)
+
+
+def test_process_pool_shares_arrays(tmp_path):
+    """Test that arrays are passed to a process pool through shared memory as
+    read-only arrays, and that other values are passed as normal"""
+    array_path = str(tmp_path / "array.npy")
+    scalar_path = str(tmp_path / "scalar.npy")
+    array = numpy.arange(1000, dtype=numpy.float32)
+
+    executor = ProcessPoolExecutor(
+        2, mp_context=get_multiprocessing_context())
+    completed = run_callbacks(executor, [
+        (partial(save_value, array_path), (array,)),
+        (partial(save_value, scalar_path), (5,)),
+        (raise_error, (1,)),
+    ])
+
+    assert completed == [0, 1, 2]
+    assert numpy.array_equal(numpy.load(array_path), array)
+    assert open(array_path + ".writeable").read() == "False"
+    assert numpy.load(scalar_path) == 5
+
+
+def test_thread_pool_passes_arrays_directly():
+    """Test that arrays are not copied for a thread pool"""
+    array = numpy.arange(10)
+    seen = []
+
+    completed = run_callbacks(
+        ThreadPoolExecutor(1), [(seen.append, (array,))])
+
+    assert completed == [0]
+    assert seen[0] is array
+
+
+def test_coalesce_rejected_with_process_pool():
+    """Test that coalesce can't be combined with a process pool"""
+    with pytest.raises(AssertionError):
+        builder.aOut(
+            "AO", on_update=print, coalesce=True,
+            on_update_executor=ProcessPoolExecutor(1))
+
+
+def test_on_update_name_rejected_with_process_pool():
+    """Test that on_update_name can't be combined with a process pool"""
+    with pytest.raises(AssertionError):
+        builder.aOut(
+            "AO", on_update_name=print,
+            on_update_executor=ProcessPoolExecutor(1))
+
+
+def waveform_test_func(device_name, path, conn):
+    builder.SetDeviceName(device_name)
+
+    executor = ProcessPoolExecutor(
+        1, mp_context=get_multiprocessing_context())
+    builder.WaveformOut(
+        "WAVEFORM", length=10, datatype=float,
+        on_update=partial(save_value, path),
+        on_update_executor=executor,
+        blocking=True)
+
+    builder.LoadDatabase()
+    softioc.iocInit()
+
+    conn.send("R")  # "Ready"
+    log("CHILD: Sent R over Connection to Parent")
+
+    # Keep process alive while main thread works.
+    if conn.poll(TIMEOUT):
+        val = conn.recv()
+        assert val == "D", "Did not receive expected Done character"
+    executor.shutdown()
+
+
+@requires_cothread
+def test_waveform_on_update_executor(tmp_path):
+    """Test that a waveform on_update can run in a process pool, and that
+    blocking completion is signalled once it has finished"""
+    ctx = get_multiprocessing_context()
+    parent_conn, child_conn = ctx.Pipe()
+
+    device_name = create_random_prefix()
+    path = str(tmp_path / "waveform.npy")
+
+    process = ctx.Process(
+        target=waveform_test_func,
+        args=(device_name, path, child_conn),
+    )
+
+    process.start()
+
+    from cothread.catools import caput, _channel_cache
+
+    try:
+        # Wait for message that IOC has started
+        select_and_recv(parent_conn, "R")
+
+        # Suppress potential spurious warnings
+        _channel_cache.purge()
+
+        value = [1.5, 2.5, 3.5]
+        put_ret = caput(
+            device_name + ":WAVEFORM", value, wait=True, timeout=TIMEOUT)
+        assert put_ret.ok, f"caput did not succeed: {put_ret.errorcode}"
+
+        # As the record is blocking the callback has already completed
+        assert list(numpy.load(path)) == value
+
+    finally:
+        # Suppress potential spurious warnings
+        _channel_cache.purge()
+        parent_conn.send("D")  # "Done"
+        process.join(timeout=TIMEOUT)
+        if process.exitcode is None:
+            process.terminate()
+            pytest.fail("Process did not terminate")
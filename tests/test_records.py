@@ -353,6 +353,83 @@ def test_waveform_values_not_modifiable():
         wo.get()[0] = 5
 
 
+@pytest.mark.parametrize("creation_func", [
+    builder.WaveformIn, builder.WaveformOut])
+def test_waveform_set_without_copy(creation_func):
+    """Test that waveform set with copy=False takes ownership of the array"""
+    record = creation_func("WAVEFORM", length=5, datatype=float)
+
+    value = numpy.array([1.0, 2.0, 3.0])
+    record.set(value, copy=False)
+
+    assert record.get() is value
+    assert not value.flags.writeable
+
+    # Only arrays which can be used directly may be handed over
+    with pytest.raises(AssertionError):
+        record.set(numpy.array([1, 2], dtype=numpy.int32), copy=False)
+    with pytest.raises(AssertionError):
+        record.set([1.0, 2.0], copy=False)
+    with pytest.raises(AssertionError):
+        record.set(numpy.zeros(6), copy=False)
+
+    # A view is copied, as its base can still be changed
+    buffer = numpy.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0])
+    record.set(buffer[:5], copy=False)
+    buffer[0] = 99
+    assert list(record.get()) == [1.0, 2.0, 3.0, 4.0, 5.0]
+    assert buffer.flags.writeable
+
+    # A read-only array is taken as it is
+    value = numpy.array([7.0, 8.0])
+    value.flags.writeable = False
+    record.set(value, copy=False)
+    assert record.get() is value
+
+    # The default is still to copy
+    value = numpy.array([4.0, 5.0])
+    record.set(value)
+    assert record.get() is not value
+    assert value.flags.writeable
+
+
+@pytest.mark.parametrize(
+    "record_type",
+    ["ai", "ao", "bi", "bo", "longin", "longout", "int64in", "int64out",
+     "mbbi", "mbbo", "stringin", "stringout", "waveform"])
+def test_record_overlay_matches_field_offsets(record_type):
+    """Test that the generated record class places every field it exposes at
+    the offset reported by the EPICS database"""
+    from ctypes import addressof, create_string_buffer
+    from softioc.fields import RecordFactory, ca_timestamp
+
+    factory = RecordFactory(record_type, ["VAL", "NAME", "TIME"])
+    record_class = type(factory(0))
+    for name, (offset, size, field_type) in factory.fields.items():
+        for raw_name in (name, "_" + name):
+            if raw_name in dict(record_class._fields_):
+                assert getattr(record_class, raw_name).offset == offset, name
+
+    buffer = create_string_buffer(4096)
+    record = factory(addressof(buffer))
+    record.NAME = "RECORD:NAME"
+    assert record.NAME == "RECORD:NAME"
+    record.TIME = 1700000000.5
+    assert isinstance(record.TIME, ca_timestamp)
+    assert record.TIME.secs == 1700000000
+    assert record.TIME.nsec == 500000000
+    record.DPVT = 1234
+    assert record.DPVT == 1234
+
+    # Unknown fields, and fields which can't be overlaid, never reach the
+    # record so can't be read or assigned.
+    for name in ["NONEXISTENT", "DTYP", "BKPT", "FLNK"]:
+        with pytest.raises(KeyError):
+            setattr(record, name, 1)
+        with pytest.raises(KeyError):
+            getattr(record, name)
+
+
 def validate_fixture_names(params):
     """Provide nice names for the out_records fixture in TestValidate class"""
     return params[0].__name__
@@ -773,6 +850,71 @@ class TestOnUpdate:
                 pytest.fail("Process did not terminate")
 
 
+    def on_update_old_dispatcher_test_func(self, device_name, conn):
+        builder.SetDeviceName(device_name)
+
+        class OldDispatcher:
+            """A dispatcher without the record_name and priority arguments"""
+            def __call__(
+                    self, func, func_args=(), completion=None,
+                    completion_args=()):
+                func(*func_args)
+                if completion:
+                    completion(*completion_args)
+
+            def wait_for_quit(self):
+                pass
+
+        builder.aOut("AO", on_update=lambda value: conn.send(value))
+
+        builder.LoadDatabase()
+        softioc.iocInit(OldDispatcher())
+
+        conn.send("R")  # "Ready"
+
+        # Keep process alive while main thread works.
+        if conn.poll(TIMEOUT):
+            val = conn.recv()
+            assert val == "D", "Did not receive expected Done character"
+
+    @requires_cothread
+    def test_on_update_old_dispatcher(self):
+        """Test that dispatchers which don't accept the record_name and
+        priority arguments are still called"""
+        ctx = get_multiprocessing_context()
+        parent_conn, child_conn = ctx.Pipe()
+
+        device_name = create_random_prefix()
+
+        process = ctx.Process(
+            target=self.on_update_old_dispatcher_test_func,
+            args=(device_name, child_conn),
+        )
+
+        process.start()
+
+        from cothread.catools import caput, _channel_cache
+
+        try:
+            # Wait for message that IOC has started
+            select_and_recv(parent_conn, "R")
+
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+
+            caput(device_name + ":AO", 5, wait=True, timeout=TIMEOUT)
+            assert parent_conn.poll(TIMEOUT)
+            assert parent_conn.recv() == 5
+
+        finally:
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+            parent_conn.send("D")  # "Done"
+            process.join(timeout=TIMEOUT)
+            if process.exitcode is None:
+                process.terminate()
+                pytest.fail("Process did not terminate")
+
 
 class TestBlocking:
     """Tests related to the Blocking functionality"""
@@ -1642,3 +1784,854 @@ class TestProcess:
             _channel_cache.purge()
             parent_conn.send("D")  # "Done"
             process.join(timeout=TIMEOUT)
+
+
+class TestSetMany:
+    """Tests related to updating many IN records with set_many"""
+
+    def set_many_test_func(self, device_name, conn):
+        builder.SetDeviceName(device_name)
+
+        ai = builder.aIn("AI", initial_value=0)
+        li = builder.longIn("LI", initial_value=0)
+        wi = builder.WaveformIn("WI", length=5)
+
+        builder.LoadDatabase()
+        softioc.iocInit()
+
+        builder.set_many({ai: 1.5, li: 3, wi: [1, 2, 3]})
+        assert ai.get() == 1.5
+        assert li.get() == 3
+
+        conn.send("R")  # "Ready"
+        log("CHILD: Sent R over Connection to Parent")
+
+        # Keep process alive while main thread works.
+        while (True):
+            if conn.poll(TIMEOUT):
+                val = conn.recv()
+                if val == "D":  # "Done"
+                    break
+
+    @requires_cothread
+    def test_set_many(self):
+        """Test that set_many updates and processes every given record"""
+        ctx = get_multiprocessing_context()
+        parent_conn, child_conn = ctx.Pipe()
+
+        device_name = create_random_prefix()
+
+        process = ctx.Process(
+            target=self.set_many_test_func,
+            args=(device_name, child_conn),
+        )
+
+        process.start()
+
+        from cothread.catools import caget, _channel_cache
+
+        try:
+            # Wait for message that IOC has started
+            select_and_recv(parent_conn, "R")
+
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+
+            assert caget(device_name + ":AI", timeout=TIMEOUT) == 1.5
+            assert caget(device_name + ":LI", timeout=TIMEOUT) == 3
+            assert list(caget(device_name + ":WI", timeout=TIMEOUT)) == \
+                [1, 2, 3]
+
+        finally:
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+            parent_conn.send("D")  # "Done"
+            process.join(timeout=TIMEOUT)
+            if process.exitcode is None:
+                process.terminate()
+                pytest.fail("Process did not terminate")
+
+    def test_set_many_converts_all_before_updating(self):
+        """Test that a bad value leaves all of the records unchanged"""
+        ai = builder.aIn("AI", initial_value=1)
+        wi = builder.WaveformIn("WI", length=2)
+
+        with pytest.raises(AssertionError):
+            builder.set_many([(ai, 2), (wi, [1, 2, 3])])
+
+        assert ai.get() == 1
+
+    def test_set_many_rejects_out_records(self):
+        """Test that an OUT record leaves all of the records unchanged"""
+        ai = builder.aIn("AI", initial_value=1)
+        ao = builder.aOut("AO", initial_value=1)
+
+        with pytest.raises(AssertionError):
+            builder.set_many([(ai, 2), (ao, 2)])
+
+        assert ai.get() == 1
+        assert ao.get() == 1
+
+
+class TestIoScanGroup:
+    """Tests related to records sharing an IOSCANPVT through an IoScanGroup"""
+
+    def scan_group_test_func(self, device_name, conn):
+        builder.SetDeviceName(device_name)
+
+        group = builder.IoScanGroup()
+        builder.aIn("A", initial_value=1, scan_group=group)
+        builder.longIn("B", initial_value=2, scan_group=group)
+        builder.aIn("C", initial_value=3)
+
+        builder.LoadDatabase()
+        softioc.iocInit()
+
+        conn.send("R")  # "Ready"
+        log("CHILD: Sent R over Connection to Parent")
+
+        # Trigger the group when asked, and keep process alive until done.
+        while (True):
+            if conn.poll(TIMEOUT):
+                val = conn.recv()
+                if val == "T":  # "Trigger"
+                    # Report whether processing was queued
+                    conn.send("R" if group.trigger() else "F")
+                elif val == "D":  # "Done"
+                    break
+
+    @requires_cothread
+    def test_scan_group_trigger(self):
+        """Test that triggering a group processes every record in the group
+        and no others"""
+        ctx = get_multiprocessing_context()
+        parent_conn, child_conn = ctx.Pipe()
+
+        device_name = create_random_prefix()
+
+        process = ctx.Process(
+            target=self.scan_group_test_func,
+            args=(device_name, child_conn),
+        )
+
+        process.start()
+
+        from cothread.catools import caget, _channel_cache, FORMAT_TIME
+
+        pvs = [device_name + ":" + name for name in ["A", "B", "C"]]
+
+        try:
+            # Wait for message that IOC has started
+            select_and_recv(parent_conn, "R")
+
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+
+            before = caget(pvs, format=FORMAT_TIME, timeout=TIMEOUT)
+            assert [value for value in before] == [1, 2, 3]
+
+            parent_conn.send("T")  # "Trigger"
+            select_and_recv(parent_conn, "R")
+
+            after = caget(pvs, format=FORMAT_TIME, timeout=TIMEOUT)
+            assert after[0].timestamp > before[0].timestamp
+            assert after[1].timestamp > before[1].timestamp
+            assert after[2].timestamp == before[2].timestamp
+
+        finally:
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+            parent_conn.send("D")  # "Done"
+            process.join(timeout=TIMEOUT)
+            if process.exitcode is None:
+                process.terminate()
+                pytest.fail("Process did not terminate")
+
+
+    def test_scan_group_not_running(self):
+        """Test that triggering a group before iocInit queues nothing"""
+        group = builder.IoScanGroup(overflow_policy="coalesce")
+        builder.aIn("A", scan_group=group)
+
+        assert group.trigger() is False
+        assert group.dropped_updates == 0
+
+    def test_scan_group_invalid_overflow_policy(self):
+        with pytest.raises(AssertionError):
+            builder.IoScanGroup(overflow_policy="queue")
+
+
+@pytest.mark.parametrize("dtype,record_type", [
+    (numpy.float64, "ai"),
+    (numpy.float32, "ai"),
+    (numpy.int32, "longin"),
+    (numpy.uint16, "longin"),
+    (numpy.int64, "int64in"),
+])
+def test_record_block_types(dtype, record_type):
+    """Test that record blocks create records of the right type"""
+    block = builder.aInBlock("BLOCK:", ["A", "B"], dtype, initial_value=2)
+
+    assert block.values.dtype == dtype
+    assert list(block.values) == [2, 2]
+    assert [record._record_type_ for record in block.records] == \
+        [record_type, record_type]
+    assert block.records[1].get() == 2
+
+
+def test_record_block_record_set():
+    """Test that setting one record of a block leaves the block's alarm state
+    alone, and that the alarm state can't be set per record"""
+    block = builder.aInBlock(
+        "BLOCK:", ["A", "B"], initial_value=1, overflow_policy="coalesce")
+    block.set_alarm(alarm.MAJOR_ALARM, alarm.STATE_ALARM)
+
+    block.records[0].set(3)
+
+    assert list(block.get()) == [3, 1]
+    assert block._state == (alarm.MAJOR_ALARM, alarm.STATE_ALARM, None)
+    with pytest.raises(TypeError):
+        block.records[1].set(2, alarm.MINOR_ALARM)
+    assert not hasattr(block.records[1], "set_alarm")
+
+
+class TestRecordBlock:
+    """Tests related to blocks of records with values held in one array"""
+
+    def record_block_test_func(self, device_name, conn):
+        builder.SetDeviceName(device_name)
+
+        floats = builder.aInBlock("F:", ["A", "B", "C"], PREC=2)
+        ints = builder.aInBlock("I:", ["A", "B"], numpy.int32)
+
+        builder.LoadDatabase()
+        softioc.iocInit()
+
+        floats.set([1.5, 2.5, 3.5])
+        ints.values[:] = [4, 5]
+        ints.trigger()
+        builder.set_many({floats.records[2]: 7.25})
+
+        conn.send("R")  # "Ready"
+        log("CHILD: Sent R over Connection to Parent")
+
+        # Keep process alive while main thread works.
+        while (True):
+            if conn.poll(TIMEOUT):
+                val = conn.recv()
+                if val == "D":  # "Done"
+                    break
+
+    @requires_cothread
+    def test_record_block(self):
+        """Test that record block values are published"""
+        ctx = get_multiprocessing_context()
+        parent_conn, child_conn = ctx.Pipe()
+
+        device_name = create_random_prefix()
+
+        process = ctx.Process(
+            target=self.record_block_test_func,
+            args=(device_name, child_conn),
+        )
+
+        process.start()
+
+        from cothread.catools import caget, _channel_cache
+
+        try:
+            # Wait for message that IOC has started
+            select_and_recv(parent_conn, "R")
+
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+
+            names = ["F:A", "F:B", "F:C", "I:A", "I:B"]
+            values = caget(
+                [device_name + ":" + name for name in names], timeout=TIMEOUT)
+            assert values == [1.5, 2.5, 7.25, 4, 5]
+
+        finally:
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+            parent_conn.send("D")  # "Done"
+            process.join(timeout=TIMEOUT)
+            if process.exitcode is None:
+                process.terminate()
+                pytest.fail("Process did not terminate")
+
+
+class TestDoubleBufferedWaveform:
+    """Tests related to waveform In records with double_buffer=True"""
+
+    values = [[1, 2, 3], [4, 5, 6, 7], [8], [9, 10]]
+
+    def double_buffer_test_func(self, device_name, conn):
+        builder.SetDeviceName(device_name)
+
+        wi = builder.WaveformIn(
+            "WI", initial_value=[0], length=5, double_buffer=True)
+
+        builder.LoadDatabase()
+        softioc.iocInit()
+
+        conn.send("R")  # "Ready"
+        log("CHILD: Sent R over Connection to Parent")
+
+        # Set each of the values in turn when asked, then keep process alive
+        # until done.
+        values = iter(self.values)
+        while (True):
+            if conn.poll(TIMEOUT):
+                val = conn.recv()
+                if val == "N":  # "Next"
+                    wi.set(next(values))
+                    conn.send("R")
+                elif val == "D":  # "Done"
+                    break
+
+    @requires_cothread
+    def test_double_buffered_waveform(self):
+        """Test that successive values of a double buffered waveform are
+        published correctly"""
+        ctx = get_multiprocessing_context()
+        parent_conn, child_conn = ctx.Pipe()
+
+        device_name = create_random_prefix()
+
+        process = ctx.Process(
+            target=self.double_buffer_test_func,
+            args=(device_name, child_conn),
+        )
+
+        process.start()
+
+        from cothread.catools import caget, _channel_cache
+
+        try:
+            # Wait for message that IOC has started
+            select_and_recv(parent_conn, "R")
+
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+
+            pv = device_name + ":WI"
+            assert list(caget(pv, timeout=TIMEOUT)) == [0]
+
+            for value in self.values:
+                parent_conn.send("N")  # "Next"
+                select_and_recv(parent_conn, "R")
+                assert list(caget(pv, timeout=TIMEOUT)) == value
+
+        finally:
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+            parent_conn.send("D")  # "Done"
+            process.join(timeout=TIMEOUT)
+            if process.exitcode is None:
+                process.terminate()
+                pytest.fail("Process did not terminate")
+
+
+def test_waveform_partial_updates():
+    """Test the values produced by waveform set_slice and append"""
+    wi = builder.WaveformIn("WI", initial_value=[1, 2, 3], length=6)
+
+    wi.set_slice(1, [5, 6])
+    assert list(wi.get()) == [1, 5, 6]
+    wi.set_slice(2, [7, 8])
+    assert list(wi.get()) == [1, 5, 7, 8]
+    wi.append([9])
+    assert list(wi.get()) == [1, 5, 7, 8, 9]
+
+    # A partial update after a complete update starts from the new value
+    wi.set([4])
+    wi.append([3, 2])
+    assert list(wi.get()) == [4, 3, 2]
+
+    # Appending past the end of the waveform discards the oldest values
+    wi.append([1, 0, -1, -2])
+    assert list(wi.get()) == [3, 2, 1, 0, -1, -2]
+
+    with pytest.raises(ValueError):
+        wi.get()[0] = 5
+    with pytest.raises(AssertionError):
+        wi.set_slice(7, [1])
+    with pytest.raises(AssertionError):
+        wi.set_slice(5, [1, 2])
+
+
+def test_waveform_set_slice_keeps_returned_arrays():
+    """Test that set_slice and append don't change arrays returned by get"""
+    wi = builder.WaveformIn("WI", initial_value=[1, 2, 3], length=6)
+
+    wi.set_slice(1, [5, 6])
+    first = wi.get()
+    wi.set_slice(0, [7])
+    second = wi.get()
+    wi.append([8])
+
+    assert list(first) == [1, 5, 6]
+    assert list(second) == [7, 5, 6]
+    assert list(wi.get()) == [7, 5, 6, 8]
+
+
+@pytest.mark.parametrize("double_buffer", [False, True])
+class TestPartialWaveformUpdates:
+    """Tests that waveform set_slice and append updates are published"""
+
+    updates = [
+        ("set_slice", (1, [5, 6]), [1, 5, 6]),
+        ("append", ([7, 8],), [1, 5, 6, 7, 8]),
+        ("set_slice", (0, [9]), [9, 5, 6, 7, 8]),
+        ("set", ([1, 2],), [1, 2]),
+        ("append", ([3],), [1, 2, 3]),
+        ("append", ([4, 5, 6],), [2, 3, 4, 5, 6]),
+        ("set_slice", (4, [0]), [2, 3, 4, 5, 0]),
+    ]
+
+    def partial_update_test_func(self, device_name, double_buffer, conn):
+        builder.SetDeviceName(device_name)
+
+        wi = builder.WaveformIn(
+            "WI", initial_value=[1, 2, 3], length=5,
+            double_buffer=double_buffer)
+
+        builder.LoadDatabase()
+        softioc.iocInit()
+
+        conn.send("R")  # "Ready"
+        log("CHILD: Sent R over Connection to Parent")
+
+        # Apply each of the updates in turn when asked, then keep process
+        # alive until done.
+        updates = iter(self.updates)
+        while (True):
+            if conn.poll(TIMEOUT):
+                val = conn.recv()
+                if val == "N":  # "Next"
+                    method, args, _ = next(updates)
+                    getattr(wi, method)(*args)
+                    conn.send("R")
+                elif val == "D":  # "Done"
+                    break
+
+    @requires_cothread
+    def test_partial_waveform_updates(self, double_buffer):
+        ctx = get_multiprocessing_context()
+        parent_conn, child_conn = ctx.Pipe()
+
+        device_name = create_random_prefix()
+
+        process = ctx.Process(
+            target=self.partial_update_test_func,
+            args=(device_name, double_buffer, child_conn),
+        )
+
+        process.start()
+
+        from cothread.catools import caget, _channel_cache
+
+        try:
+            # Wait for message that IOC has started
+            select_and_recv(parent_conn, "R")
+
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+
+            pv = device_name + ":WI"
+            assert list(caget(pv, timeout=TIMEOUT)) == [1, 2, 3]
+
+            for _, _, expected in self.updates:
+                parent_conn.send("N")  # "Next"
+                select_and_recv(parent_conn, "R")
+                assert list(caget(pv, timeout=TIMEOUT)) == expected
+
+        finally:
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+            parent_conn.send("D")  # "Done"
+            process.join(timeout=TIMEOUT)
+            if process.exitcode is None:
+                process.terminate()
+                pytest.fail("Process did not terminate")
+
+
+class TestCoalesce:
+    """Tests related to Out records with coalesce=True"""
+
+    def coalesce_test_func(self, device_name, conn):
+        import time
+        builder.SetDeviceName(device_name)
+
+        values = []
+
+        def on_update(value):
+            # A slow handler, so that later writes queue up behind it
+            time.sleep(0.2)
+            values.append(value)
+
+        builder.longOut(
+            "LO", initial_value=0, on_update=on_update, coalesce=True)
+
+        dispatcher = asyncio_dispatcher.AsyncioDispatcher()
+        builder.LoadDatabase()
+        softioc.iocInit(dispatcher)
+
+        conn.send("R")  # "Ready"
+        log("CHILD: Sent R over Connection to Parent")
+
+        # Report the values seen once the last one has arrived
+        while (True):
+            if conn.poll(TIMEOUT):
+                val = conn.recv()
+                if val == "G":  # "Get"
+                    deadline = time.time() + TIMEOUT
+                    while values[-1:] != [20] and time.time() < deadline:
+                        time.sleep(0.05)
+                    conn.send(values)
+                elif val == "D":  # "Done"
+                    break
+
+    @requires_cothread
+    def test_coalesce(self):
+        """Test that on_update skips values superseded while it was busy"""
+        ctx = get_multiprocessing_context()
+        parent_conn, child_conn = ctx.Pipe()
+
+        device_name = create_random_prefix()
+
+        process = ctx.Process(
+            target=self.coalesce_test_func,
+            args=(device_name, child_conn),
+        )
+
+        process.start()
+
+        from cothread.catools import caput, _channel_cache
+
+        try:
+            # Wait for message that IOC has started
+            select_and_recv(parent_conn, "R")
+
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+
+            for value in range(1, 21):
+                caput(device_name + ":LO", value, wait=True, timeout=TIMEOUT)
+
+            parent_conn.send("G")  # "Get"
+            assert parent_conn.poll(TIMEOUT)
+            values = parent_conn.recv()
+
+            assert values[-1] == 20
+            assert values == sorted(values)
+            assert len(values) < 20
+
+        finally:
+            # Suppress potential spurious warnings
+            _channel_cache.purge()
+            parent_conn.send("D")  # "Done"
+            process.join(timeout=TIMEOUT)
+            if process.exitcode is None:
+                process.terminate()
+                pytest.fail("Process did not terminate")
+
+
+class TestSetAsync:
+    """Tests related to set_async and set_and_wait on In records"""
+
+    def set_async_test_func(self, device_name, conn):
+        builder.SetDeviceName(device_name)
+
+        ai = builder.aIn("AI", initial_value=0)
+        passive = builder.longIn("PASSIVE", initial_value=0, SCAN="Passive")
+
+        dispatcher = asyncio_dispatcher.AsyncioDispatcher()
+        builder.LoadDatabase()
+        softioc.iocInit(dispatcher)
+
+        async def set_values():
+            # Each value has reached the record once set_async returns
+            processed = []
+            for value in range(1, 11):
+                await ai.set_async(value)
+                processed.append(float(ai.get_field("VAL")))
+            # A record which isn't triggered doesn't hold up the caller
+            await asyncio.wait_for(passive.set_async(5), TIMEOUT)
+            return processed
+
+        conn.send(asyncio.run_coroutine_threadsafe(
+            set_values(), dispatcher.loop).result(TIMEOUT))
+
+    def set_and_wait_test_func(self, device_name, conn):
+        builder.SetDeviceName(device_name)
+
+        ai = builder.aIn("AI", initial_value=0)
+
+        builder.LoadDatabase()
+        softioc.iocInit()
+
+        processed = []
+        for value in range(1, 11):
+            ai.set_and_wait(value, timeout=TIMEOUT)
+            processed.append(float(ai.get_field("VAL")))
+        conn.send(processed)
+
+    def failed_waiter_test_func(self, device_name, conn):
+        import threading
+        import time
+
+        builder.SetDeviceName(device_name)
+
+        # As for TestOverflowPolicy, GATE_IN holds up the LOW priority callback
+        # thread until the gate is opened.
+        armed = threading.Event()
+        entered = threading.Event()
+        gate = threading.Event()
+
+        def validate(record, value):
+            if armed.is_set():
+                entered.set()
+                gate.wait(TIMEOUT)
+            return True
+        builder.aOut("GATE", validate=validate, always_update=True)
+        gate_in = builder.aIn("GATE_IN", FLNK=device_name + ":GATE")
+        ai = builder.aIn("AI", initial_value=0)
+
+        dispatcher = asyncio_dispatcher.AsyncioDispatcher()
+        builder.LoadDatabase()
+        softioc.iocInit(dispatcher)
+
+        armed.set()
+        gate_in.set(1)
+        assert entered.wait(TIMEOUT)
+
+        # This waiter gives up and its event loop is closed before the record
+        # is processed, so notifying it fails.
+        async def give_up():
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(ai.set_async(1), 0.1)
+        asyncio.run(give_up())
+
+        waiter = asyncio.run_coroutine_threadsafe(
+            ai.set_async(2), dispatcher.loop)
+        time.sleep(0.5)
+        gate.set()
+        waiter.result(TIMEOUT)
+        conn.send(float(ai.get_field("VAL")))
+
+    @pytest.mark.parametrize(
+        "test_func", ["set_async_test_func", "set_and_wait_test_func"])
+    def test_set_async(self, test_func):
+        """Test that waiting for a set returns after the record has
+        processed the new value"""
+        ctx = get_multiprocessing_context()
+        parent_conn, child_conn = ctx.Pipe()
+
+        device_name = create_random_prefix()
+
+        process = ctx.Process(
+            target=getattr(self, test_func),
+            args=(device_name, child_conn),
+        )
+
+        process.start()
+
+        try:
+            assert parent_conn.poll(TIMEOUT)
+            assert parent_conn.recv() == list(range(1, 11))
+        finally:
+            process.join(timeout=TIMEOUT)
+            if process.exitcode is None:
+                process.terminate()
+                pytest.fail("Process did not terminate")
+
+
+    def test_failed_waiter(self):
+        """Test that a waiter which cannot be notified doesn't stop the
+        others from being released"""
+        ctx = get_multiprocessing_context()
+        parent_conn, child_conn = ctx.Pipe()
+
+        device_name = create_random_prefix()
+
+        process = ctx.Process(
+            target=self.failed_waiter_test_func,
+            args=(device_name, child_conn),
+        )
+
+        process.start()
+
+        try:
+            assert parent_conn.poll(TIMEOUT * 2)
+            assert parent_conn.recv() == 2
+        finally:
+            process.join(timeout=TIMEOUT)
+            if process.exitcode is None:
+                process.terminate()
+                pytest.fail("Process did not terminate")
+
+
+class TestOverflowPolicy:
+    """Tests of IN records when the EPICS callback queue is full"""
+
+    QUEUE_SIZE = 20
+    RECORDS = 50
+
+    def overflow_test_func(self, device_name, policy, conn):
+        import threading
+        import time
+        from softioc.imports import callbackSetQueueSize
+
+        builder.SetDeviceName(device_name)
+        callbackSetQueueSize(self.QUEUE_SIZE)
+
+        # Once armed, processing GATE_IN holds up the LOW priority callback
+        # thread until the gate is opened, so that the callback queue fills
+        # up.
+        armed = threading.Event()
+        entered = threading.Event()
+        gate = threading.Event()
+
+        def validate(record, value):
+            if armed.is_set():
+                entered.set()
+                gate.wait(TIMEOUT)
+            return True
+        builder.aOut("GATE", validate=validate, always_update=True)
+        gate_in = builder.aIn("GATE_IN", FLNK=device_name + ":GATE")
+
+        records = [
+            builder.longIn(
+                "REC%d" % n, initial_value=0,
+                overflow_policy=policy, overflow_timeout=TIMEOUT)
+            for n in range(self.RECORDS)]
+
+        # A group only applies its policy to triggering the group itself, so
+        # an update to its record is only processed through the group.
+        group = builder.IoScanGroup(
+            overflow_policy=policy, overflow_timeout=TIMEOUT)
+        group_record = builder.longIn(
+            "GROUP", initial_value=0,
+            scan_group=group, overflow_policy="drop")
+
+        builder.LoadDatabase()
+        softioc.iocInit(asyncio_dispatcher.AsyncioDispatcher())
+
+        armed.set()
+        gate_in.set(1)
+        assert entered.wait(TIMEOUT)
+
+        def set_records():
+            for record in records[:-1]:
+                record.set(1)
+            # set_many applies the same policy as set
+            builder.set_many({records[-1]: 1})
+            group_record.set(1)
+            group.trigger()
+        setter = threading.Thread(target=set_records)
+        setter.start()
+        time.sleep(0.5)
+        status = softioc.callbackQueueStatus()
+        gate.set()
+        setter.join(TIMEOUT)
+
+        # Give the records time to process
+        deadline = time.time() + TIMEOUT
+        while time.time() < deadline:
+            processed = [
+                int(r.get_field("VAL")) for r in records + [group_record]]
+            if policy == "drop" or all(processed):
+                break
+            time.sleep(0.1)
+
+        conn.send((
+            status,
+            processed,
+            [record.dropped_updates for record in records],
+            group.dropped_updates))
+
+    @pytest.mark.parametrize("policy", ["drop", "block", "coalesce"])
+    def test_overflow_policy(self, policy):
+        """Test that updates dropped because the callback queue is full are
+        counted, or are processed later with the block and coalesce
+        policies"""
+        ctx = get_multiprocessing_context()
+        parent_conn, child_conn = ctx.Pipe()
+
+        device_name = create_random_prefix()
+
+        process = ctx.Process(
+            target=self.overflow_test_func,
+            args=(device_name, policy, child_conn),
+        )
+
+        process.start()
+
+        try:
+            assert parent_conn.poll(TIMEOUT * 2)
+            status, processed, dropped, group_dropped = parent_conn.recv()
+
+            # The LOW priority queue filled up
+            assert status.size == self.QUEUE_SIZE
+            assert status.max_used[0] == self.QUEUE_SIZE
+            assert status.overflows[0] > 0
+
+            if policy == "drop":
+                assert processed[-1] == 0
+                assert group_dropped == 1
+                processed = processed[:-1]
+                assert sum(dropped) == processed.count(0) > 0
+            else:
+                assert all(processed)
+                assert sum(dropped) == 0
+                assert group_dropped == 0
+        finally:
+            process.join(timeout=TIMEOUT)
+            if process.exitcode is None:
+                process.terminate()
+                pytest.fail("Process did not terminate")
+
+    def paused_test_func(self, device_name, conn):
+        from epicscorelibs.ioc import dbCore
+
+        builder.SetDeviceName(device_name)
+        record = builder.longIn(
+            "REC", initial_value=0, overflow_policy="coalesce")
+
+        builder.LoadDatabase()
+        softioc.iocInit(asyncio_dispatcher.AsyncioDispatcher())
+
+        dbCore.scanPause()
+        queued = record.trigger()
+        dbCore.scanRun()
+
+        conn.send((queued, record.dropped_updates))
+
+    def test_paused_scanning_is_not_overflow(self):
+        """Test that an update which cannot be queued because scanning is
+        paused is not treated as a full callback queue"""
+        ctx = get_multiprocessing_context()
+        parent_conn, child_conn = ctx.Pipe()
+
+        device_name = create_random_prefix()
+
+        process = ctx.Process(
+            target=self.paused_test_func,
+            args=(device_name, child_conn),
+        )
+
+        process.start()
+
+        try:
+            assert parent_conn.poll(TIMEOUT)
+            queued, dropped = parent_conn.recv()
+
+            assert not queued
+            assert dropped == 0
+        finally:
+            process.join(timeout=TIMEOUT)
+            if process.exitcode is None:
+                process.terminate()
+                pytest.fail("Process did not terminate")
@@ -0,0 +1,182 @@
+import pytest
+import threading
+import time
+
+from conftest import (
+    create_random_prefix,
+    get_multiprocessing_context,
+    log,
+    requires_cothread,
+    select_and_recv,
+    TIMEOUT,
+)
+
+from softioc import builder, softioc
+from softioc.thread_pool_dispatcher import ThreadPoolDispatcher
+
+
+def test_callbacks_for_different_records_run_in_parallel():
+    """Test that a blocked callback does not hold up other records"""
+    barrier = threading.Barrier(2, timeout=TIMEOUT)
+    completed = []
+
+    # Callbacks are matched to records by their completion
+    def complete_a():
+        completed.append("A")
+
+    def complete_b():
+        completed.append("B")
+
+    with ThreadPoolDispatcher(max_workers=2) as dispatcher:
+        dispatcher(barrier.wait, (), complete_a)
+        dispatcher(barrier.wait, (), complete_b)
+
+    # Neither callback could have finished unless they ran together
+    assert sorted(completed) == ["A", "B"]
+    assert not barrier.broken
+
+
+def test_callbacks_for_same_record_run_in_order():
+    """Test that callbacks with the same completion run one at a time and in
+    order, and that completion is signalled for each of them"""
+    values = []
+    completed = []
+    active = []
+
+    def on_update(value):
+        active.append(value)
+        assert len(active) == 1
+        time.sleep(0.01)
+        values.append(value)
+        active.remove(value)
+
+    def complete(value):
+        completed.append(value)
+
+    with ThreadPoolDispatcher(max_workers=4) as dispatcher:
+        for value in range(10):
+            dispatcher(on_update, (value,), complete, (value,))
+
+    assert values == list(range(10))
+    assert completed == list(range(10))
+
+
+def test_exceptions_do_not_stop_queue():
+    """Test that an exception in a callback is logged and that later
+    callbacks still run"""
+    values = []
+
+    def on_update(value):
+        if value == 1:
+            raise ValueError(value)
+        values.append(value)
+
+    with ThreadPoolDispatcher() as dispatcher:
+        for value in range(3):
+            dispatcher(on_update, (value,))
+
+    assert values == [0, 2]
+
+
+def test_no_per_record_ordering():
+    """Test that callbacks for one record can run in parallel when ordering
+    is not requested"""
+    barrier = threading.Barrier(2, timeout=TIMEOUT)
+
+    def complete():
+        pass
+
+    with ThreadPoolDispatcher(
+            max_workers=2, per_record_ordering=False) as dispatcher:
+        dispatcher(barrier.wait, (), complete)
+        dispatcher(barrier.wait, (), complete)
+
+    assert not barrier.broken
+
+
+def test_waiting_callbacks_run_in_priority_order():
+    """Test that callbacks waiting for a thread are started in priority
+    order"""
+    from softioc.callback_queue import LOW, MEDIUM, HIGH
+    release = threading.Event()
+    results = []
+
+    # Without ordering the callbacks aren't held back as being for the same
+    # record
+    with ThreadPoolDispatcher(
+            max_workers=1, per_record_ordering=False) as dispatcher:
+        # Occupy the only thread while the other callbacks are dispatched
+        dispatcher(release.wait, (TIMEOUT,))
+        for value, priority in [(1, LOW), (2, HIGH), (3, MEDIUM), (4, HIGH)]:
+            dispatcher(results.append, (value,), priority=priority)
+        release.set()
+
+    assert results == [2, 4, 3, 1]
+
+
+def blocking_test_func(device_name, conn):
+    builder.SetDeviceName(device_name)
+
+    count_rec = builder.longIn("COUNTER", initial_value=0)
+
+    def blocking_update_func(new_val):
+        # Blocks the calling thread, as for example serial I/O would
+        time.sleep(0.2)
+        count_rec.set(count_rec.get() + 1)
+
+    builder.longOut(
+        "BLOCKING-REC",
+        on_update=blocking_update_func,
+        always_update=True,
+        blocking=True)
+
+    builder.LoadDatabase()
+    softioc.iocInit(ThreadPoolDispatcher(max_workers=4))
+
+    conn.send("R")  # "Ready"
+    log("CHILD: Sent R over Connection to Parent")
+
+    # Keep process alive while main thread runs CAGET
+    if conn.poll(TIMEOUT):
+        val = conn.recv()
+        assert val == "D", "Did not receive expected Done character"
+
+
+@requires_cothread
+def test_blocking_completion():
+    """Test that blocking records signal completion from the pool threads"""
+    ctx = get_multiprocessing_context()
+    parent_conn, child_conn = ctx.Pipe()
+
+    device_name = create_random_prefix()
+
+    process = ctx.Process(
+        target=blocking_test_func,
+        args=(device_name, child_conn),
+    )
+
+    process.start()
+
+    from cothread.catools import caget, caput, _channel_cache
+
+    try:
+        # Wait for message that IOC has started
+        select_and_recv(parent_conn, "R")
+
+        # Suppress potential spurious warnings
+        _channel_cache.purge()
+
+        for count in range(1, 4):
+            put_ret = caput(
+                device_name + ":BLOCKING-REC", 5, wait=True, timeout=TIMEOUT)
+            assert put_ret.ok, f"caput did not succeed: {put_ret.errorcode}"
+            assert caget(device_name + ":COUNTER", timeout=TIMEOUT) == count
+
+    finally:
+        # Suppress potential spurious warnings
+        _channel_cache.purge()
+        parent_conn.send("D")  # "Done"
+        process.join(timeout=TIMEOUT)
+        if process.exitcode is None:
+            process.terminate()
+            pytest.fail("Process did not terminate")